@@ -29,7 +29,7 @@ const App: React.FC = () => {
   const [isSessionLoading, setIsSessionLoading] = useState(true);
 
   // Module A: AI Brain
-  const { analyze, result, error, isAnalyzing, resetBrain } = useGeminiBrain();
+  const { analyze, result, partial, error, isAnalyzing, resetBrain } = useGeminiBrain();
 
   // Check for existing session
   useEffect(() => {
@@ -151,7 +151,7 @@ const App: React.FC = () => {
         );
 
     case 'PROCESSING':
-        return <ProcessingView />;
+        return <ProcessingView partial={partial} />;
 
     case 'REPORT':
         if (error) {
@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Callable, Awaitable
+from sqlmodel import SQLModel, Field, Session
+
+from .gemini_service import current_model_id, PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIG ---
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+ANALYSIS_CACHE_TTL_HOURS = float(os.getenv("ANALYSIS_CACHE_TTL_HOURS", "168"))
+_DIGEST_CHUNK_BYTES = 1024 * 1024
+
+# --- DATABASE MODELS ---
+class AnalysisCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True)
+    result_json: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+def _finish_key(digest, activity_name: str, mime_type: str) -> str:
+    for part in (activity_name, mime_type, current_model_id(), PROMPT_VERSION):
+        digest.update(b"\0" + part.encode("utf-8"))
+    return digest.hexdigest()
+
+def build_file_cache_key(video_file, activity_name: str, mime_type: str) -> str:
+    """
+    Content address of an analysis: hash of the raw video plus everything else that shapes the answer.
+    The video is read in chunks from the file-like object, so it is never copied whole.
+    """
+    digest = hashlib.sha256()
+    video_file.seek(0)
+    for chunk in iter(lambda: video_file.read(_DIGEST_CHUNK_BYTES), b""):
+        digest.update(chunk)
+    return _finish_key(digest, activity_name, mime_type)
+
+
+class AnalysisCache:
+    """
+    Two-tier cache of analysis results.
+
+    Tier 1 is an in-process LRU bounded by the serialized size of its entries.
+    Tier 2 is the AnalysisCacheEntry table, so results survive restarts and are
+    shared between workers. Concurrent misses on the same key share one upstream call.
+    """
+
+    def __init__(self, engine, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES, ttl_hours: float = ANALYSIS_CACHE_TTL_HOURS):
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.ttl = timedelta(hours=ttl_hours)
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._inflight = {}
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def stats(self) -> dict:
+        return {
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._memory),
+            "bytes": self._memory_bytes,
+            "inflight": len(self._inflight),
+        }
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        while True:
+            cached = self._memory_get(key)
+            if cached is not None:
+                self.memory_hits += 1
+                return json.loads(cached)
+
+            # Single-flight: piggyback on an identical request that is already running
+            pending = self._inflight.get(key)
+            if pending is None:
+                return await self._lead(key, compute)
+            self.coalesced += 1
+            try:
+                return json.loads(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                # The leading caller was cancelled (client gone, job runner stopping), not us:
+                # look again, and take over with our own `compute` if nobody else has
+                if pending.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+
+    async def _lead(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        """Runs the lookup/compute for `key`, publishing the outcome to coalesced callers."""
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[key] = pending
+        try:
+            try:
+                cached = await asyncio.to_thread(self._persistent_get, key)
+            except Exception as db_err:
+                logger.warning("Analysis cache lookup failed: %s", db_err)
+                cached = None
+            if cached is not None:
+                self.persistent_hits += 1
+            else:
+                self.misses += 1
+                cached = json.dumps(await compute())
+                try:
+                    await asyncio.to_thread(self._persistent_put, key, cached)
+                except Exception as db_err:
+                    logger.warning("Failed to persist cached analysis: %s", db_err)
+            self._memory_put(key, cached)
+            pending.set_result(cached)
+            return json.loads(cached)
+        except asyncio.CancelledError:
+            # Waiters see the cancelled future and retry; `compute` may read our request's spool,
+            # so the work can't outlive us
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited isn't logged as lost
+            pending.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is pending:
+                del self._inflight[key]
+
+    # --- Tier 1: in-memory LRU ---
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key: str, value: str):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = value
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # --- Tier 2: database ---
+
+    def _persistent_get(self, key: str) -> Optional[str]:
+        with Session(self.engine) as session:
+            entry = session.get(AnalysisCacheEntry, key)
+            if entry is None:
+                return None
+            if datetime.utcnow() - entry.created_at > self.ttl:
+                session.delete(entry)
+                session.commit()
+                return None
+            return entry.result_json
+
+    def _persistent_put(self, key: str, value: str):
+        with Session(self.engine) as session:
+            entry = session.get(AnalysisCacheEntry, key)
+            if entry is None:
+                entry = AnalysisCacheEntry(key=key, result_json=value)
+            else:
+                entry.result_json = value
+                entry.created_at = datetime.utcnow()
+            session.add(entry)
+            session.commit()
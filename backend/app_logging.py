@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Optional
+
+# --- CONFIG ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-logger overrides, e.g. "backend.live_media=DEBUG,backend.gemini_service=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# "json" (one object per line) or "text" for local development
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# High-frequency live-session events (per model text part, per frame) are kept 1 in N
+LOG_LIVE_EVENT_SAMPLE_EVERY = int(os.getenv("LOG_LIVE_EVENT_SAMPLE_EVERY", "50"))
+# Raw upstream responses and other large payloads are only logged when enabled, and truncated
+LOG_PAYLOADS = os.getenv("LOG_PAYLOADS", "false").lower() in ("1", "true", "yes")
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "4096"))
+
+APP_LOGGER = "backend"
+
+# LogRecord attributes that aren't user-supplied `extra` fields
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sample_count"}
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if getattr(record, "sample_count", None):
+            entry["sampled_1_in"] = record.sample_count
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Passes 1 in `every` records and notes the rate on the ones it lets through."""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(every, 1)
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        self._seen += 1
+        if self._seen % self.every:
+            return False
+        record.sample_count = self.every
+        return True
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep args/extras for the formatter on the listener thread; only resolve exc_info here
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging():
+    """
+    Routes the app's loggers through a queue: callers only enqueue the record,
+    and a listener thread formats and writes it. Safe to call more than once.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    _queue_handler = _NonBlockingQueueHandler(log_queue)
+    app_logger = logging.getLogger(APP_LOGGER)
+    app_logger.addHandler(_queue_handler)
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.propagate = False
+    for override in filter(None, (item.strip() for item in LOG_LEVELS.split(","))):
+        name, _, level = override.partition("=")
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+def shutdown_logging():
+    """
+    Flushes queued records and detaches the queue. Called on app shutdown (and
+    at exit); anything logged afterwards goes through the root logger directly.
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    app_logger = logging.getLogger(APP_LOGGER)
+    app_logger.removeHandler(_queue_handler)
+    app_logger.propagate = True
+    _listener.stop()
+    _listener = _queue_handler = None
+
+
+def get_event_logger(name: str) -> logging.Logger:
+    """Child logger for high-frequency events, sampled 1 in LOG_LIVE_EVENT_SAMPLE_EVERY."""
+    logger = logging.getLogger(f"{name}.events")
+    if not any(isinstance(f, SampleFilter) for f in logger.filters):
+        logger.addFilter(SampleFilter(LOG_LIVE_EVENT_SAMPLE_EVERY))
+    return logger
+
+def log_payload(logger: logging.Logger, label: str, payload: str):
+    """Dumps a large payload at DEBUG, only when LOG_PAYLOADS is on. Truncated to LOG_PAYLOAD_MAX_CHARS."""
+    if not LOG_PAYLOADS or not logger.isEnabledFor(logging.DEBUG):
+        return
+    logger.debug(label, extra={"payload": payload[:LOG_PAYLOAD_MAX_CHARS], "payload_chars": len(payload)})
@@ -0,0 +1,128 @@
+"""
+Concurrent read/write throughput on SQLite: the previous setup (sync engine on a
+threadpool, rollback journal) against the async engine with WAL tuning.
+
+    python -m backend.benchmarks.bench_database --clients 32 --ops 200 --write-ratio 0.2
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import MetaData, Table, Column, Integer, Float, select, func
+from sqlalchemy.exc import OperationalError
+
+from ..database import create_db_engine, create_async_db_engine
+
+metadata = MetaData()
+rows = Table(
+    "bench_row", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, index=True),
+    Column("value", Float),
+)
+
+USERS = 100
+
+
+def _read_statement(user_id: int):
+    return select(func.count()).select_from(rows).where(rows.c.user_id == user_id)
+
+def _write_statement(user_id: int):
+    return rows.insert().values(user_id=user_id, value=random.random())
+
+
+async def run_sync(url: str, clients: int, ops: int, write_ratio: float) -> dict:
+    """Baseline: default journal, every DB call parked on a threadpool worker."""
+    engine = create_db_engine(url, tune_sqlite=False)
+    metadata.create_all(engine)
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+
+    def op(is_write: bool):
+        user_id = random.randrange(USERS)
+        try:
+            if is_write:
+                with engine.begin() as conn:
+                    conn.execute(_write_statement(user_id))
+            else:
+                with engine.connect() as conn:
+                    conn.execute(_read_statement(user_id)).scalar()
+            counts["writes" if is_write else "reads"] += 1
+        except OperationalError:
+            counts["errors"] += 1
+
+    # Starlette's default threadpool size
+    executor = ThreadPoolExecutor(max_workers=40)
+    loop = asyncio.get_running_loop()
+
+    async def client():
+        for _ in range(ops):
+            await loop.run_in_executor(executor, op, random.random() < write_ratio)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+    engine.dispose()
+    return {"mode": "sync+rollback-journal", "seconds": elapsed, **counts}
+
+
+async def run_async(url: str, clients: int, ops: int, write_ratio: float) -> dict:
+    """Async engine, WAL + synchronous=NORMAL + busy timeout."""
+    engine = create_async_db_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+
+    async def client():
+        for _ in range(ops):
+            is_write = random.random() < write_ratio
+            user_id = random.randrange(USERS)
+            try:
+                if is_write:
+                    async with engine.begin() as conn:
+                        await conn.execute(_write_statement(user_id))
+                else:
+                    async with engine.connect() as conn:
+                        (await conn.execute(_read_statement(user_id))).scalar()
+                counts["writes" if is_write else "reads"] += 1
+            except OperationalError:
+                counts["errors"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return {"mode": "async+wal", "seconds": elapsed, **counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=200, help="Operations per client")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, runner in (("before", run_sync), ("after", run_async)):
+            url = f"sqlite:///{os.path.join(tmp, name + '.db')}"
+            r = asyncio.run(runner(url, args.clients, args.ops, args.write_ratio))
+            r["ops_per_second"] = round((r["reads"] + r["writes"]) / r["seconds"], 1)
+            r["seconds"] = round(r["seconds"], 3)
+            results.append(r)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<24} {'ops/s':>9} {'reads':>7} {'writes':>7} {'errors':>7} {'seconds':>8}")
+    for r in results:
+        print(f"{r['mode']:<24} {r['ops_per_second']:>9} {r['reads']:>7} {r['writes']:>7} {r['errors']:>7} {r['seconds']:>8}")
+
+
+if __name__ == "__main__":
+    main()
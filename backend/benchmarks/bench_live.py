@@ -0,0 +1,251 @@
+"""
+Load test for /ws/live-safety-monitor against a local fake Gemini live session.
+
+Starts the app in a subprocess with the live session pool wired to
+benchmarks.fake_live, then opens N concurrent WebSocket clients that each
+replay a JPEG + 16 kHz PCM stream. Every `--pain-every`-th frame carries a
+marker the fake answers with an alert, which gives end-to-end alert latency.
+
+    python -m backend.benchmarks.bench_live --clients 50 --duration 30 --binary
+    python -m backend.benchmarks.bench_live --handler tool --upstream-send-ms 200
+
+A recording directory may hold frames (*.jpg, replayed in name order) and
+audio.pcm (raw 16 kHz s16le mono); otherwise a synthetic stream is used.
+"""
+import io
+import os
+import sys
+import json
+import glob
+import time
+import base64
+import asyncio
+import argparse
+import tempfile
+from collections import deque
+
+from ..live_media import LIVE_BINARY_SUBPROTOCOL, MEDIA_AUDIO, MEDIA_VIDEO, encode_binary_frame
+from .fake_live import PAIN_MARKER, FakeLiveStats, fake_connect_factory
+from .server_harness import percentile, serve_until_stdin_closes, run_with_server
+# Matches useLiveSafetyMonitor.ts: 4096-sample chunks at 16 kHz
+AUDIO_CHUNK_SAMPLES = 4096
+AUDIO_SAMPLE_RATE = 16000
+ROUTES = {"text": "/ws/live-safety-monitor", "tool": "/ws/bench/tool-monitor"}
+
+
+# --- SERVER SIDE (subprocess) ---
+
+async def monitor_loop_lag(samples: list, interval: float = 0.05):
+    """Records how late the event loop wakes a sleeping task, in ms."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+async def serve(args):
+    from .. import main
+    from ..live_pool import LiveSessionPool
+    from ..live_media import accept_live_socket, frame_totals
+    from ..live_monitor import manage_live_safety_session
+
+    stats = FakeLiveStats()
+    latencies = dict(
+        connect_latency=args.upstream_connect_ms / 1000,
+        send_latency=args.upstream_send_ms / 1000,
+        response_latency=args.upstream_response_ms / 1000,
+        chatter_every=args.chatter_every,
+    )
+    # The endpoint looks the pool up at call time, so swapping the module global is enough
+    main.live_pool = LiveSessionPool(fake_connect_factory(stats, mode="text", **latencies), size=args.pool_size)
+    tool_connect = fake_connect_factory(stats, mode="tool", **latencies)
+
+    @main.app.websocket(ROUTES["tool"])
+    async def tool_monitor(websocket):
+        binary = await accept_live_socket(websocket)
+        await manage_live_safety_session(websocket, binary, connect=tool_connect)
+
+    lag = []
+    lag_task = asyncio.create_task(monitor_loop_lag(lag))
+    elapsed = await serve_until_stdin_closes(main.app, args.port)
+    lag_task.cancel()
+
+    print(json.dumps({
+        "upstream_connects": stats.connects,
+        "frames_forwarded": stats.media_sent,
+        "frames_forwarded_per_s": round(stats.media_sent / elapsed, 1),
+        "video_frames_deduplicated": frame_totals["dropped"],
+        "loop_lag_ms": {"p50": percentile(lag, 50), "p99": percentile(lag, 99), "max": round(max(lag, default=0.0), 1)},
+        "session_pool": main.live_pool.stats(),
+    }))
+
+
+# --- CLIENT SIDE ---
+
+def load_stream(recording: str):
+    """Returns (jpeg frames, pcm chunks)."""
+    if recording:
+        frames = [open(path, "rb").read() for path in sorted(glob.glob(os.path.join(recording, "*.jpg")))]
+        with open(os.path.join(recording, "audio.pcm"), "rb") as f:
+            pcm = f.read()
+        chunk = AUDIO_CHUNK_SAMPLES * 2
+        chunks = [pcm[i:i + chunk] for i in range(0, len(pcm) - chunk + 1, chunk)]
+        if not frames or not chunks:
+            raise SystemExit(f"❌ {recording} needs *.jpg frames and at least one chunk of audio.pcm")
+        return frames, chunks
+
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    frames = []
+    for i in range(10):
+        # A square sweeping across the frame so consecutive frames differ, like a patient moving
+        image = Image.new("RGB", (320, 240), (90, 90, 90))
+        ImageDraw.Draw(image).rectangle([20 + i * 25, 80, 80 + i * 25, 160], fill=(220, 180, 150))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=50)
+        frames.append(buffer.getvalue())
+
+    rng = np.random.default_rng(0)
+    chunks = []
+    for i in range(20):
+        # Alternating speech-level noise (~-25 dBFS) and near-silence, so the VAD gate has work to do
+        level = 1800 if (i // 4) % 2 == 0 else 20
+        chunks.append(rng.normal(0, level, AUDIO_CHUNK_SAMPLES).clip(-32768, 32767).astype("<i2").tobytes())
+    return frames, chunks
+
+async def send_media(ws, binary: bool, kind: int, data: bytes):
+    if binary:
+        await ws.send(encode_binary_frame(kind, data))
+    else:
+        key = "audio" if kind == MEDIA_AUDIO else "image"
+        await ws.send(json.dumps({key: base64.b64encode(data).decode("ascii")}))
+
+async def run_client(url: str, stream, args, result: dict):
+    import websockets
+
+    frames, chunks = stream
+    loop = asyncio.get_running_loop()
+    pending = deque() # send times of pain frames still waiting for their alert
+
+    async def read_alerts(ws):
+        async for message in ws:
+            if isinstance(message, bytes):
+                continue
+            msg = json.loads(message)
+            # Local audio distress alerts aren't answers to a pain frame
+            if msg.get("status") not in ("ALERT", "STOP") or msg.get("source") == "audio":
+                continue
+            now = time.perf_counter()
+            # Pain frames never answered (deduplicated or dropped on the way) are skipped
+            while pending and now - pending[0] > args.alert_timeout:
+                pending.popleft()
+            if pending:
+                result["alert_latencies_ms"].append((now - pending.popleft()) * 1000)
+
+    try:
+        subprotocols = [LIVE_BINARY_SUBPROTOCOL] if args.binary else None
+        async with websockets.connect(url, subprotocols=subprotocols, max_size=None) as ws:
+            reader = asyncio.create_task(read_alerts(ws))
+            audio_interval = AUDIO_CHUNK_SAMPLES / AUDIO_SAMPLE_RATE
+            start = loop.time()
+            tick = frame_index = 0
+            next_frame = 0.0
+            while loop.time() - start < args.duration:
+                await send_media(ws, args.binary, MEDIA_AUDIO, chunks[tick % len(chunks)])
+                result["frames_sent"] += 1
+                while next_frame <= loop.time() - start:
+                    frame = frames[frame_index % len(frames)]
+                    if args.pain_every and frame_index % args.pain_every == args.pain_every - 1:
+                        frame += PAIN_MARKER
+                        pending.append(time.perf_counter())
+                        result["pain_frames"] += 1
+                    await send_media(ws, args.binary, MEDIA_VIDEO, frame)
+                    result["frames_sent"] += 1
+                    frame_index += 1
+                    next_frame += 1 / args.fps
+                tick += 1
+                await asyncio.sleep(max(0.0, start + tick * audio_interval - loop.time()))
+            # Give in-flight alerts a moment before hanging up
+            await asyncio.sleep(min(args.alert_timeout, 1.0))
+            result["sustained"] += 0 if reader.done() else 1
+            reader.cancel()
+    except Exception as e:
+        result["errors"].append(repr(e))
+
+async def drive(args, port: int) -> dict:
+    stream = load_stream(args.recording)
+    url = f"ws://127.0.0.1:{port}{ROUTES[args.handler]}"
+    result = {"sustained": 0, "frames_sent": 0, "pain_frames": 0, "alert_latencies_ms": [], "errors": []}
+
+    async def delayed(i):
+        # Spread connects over the ramp so the pool refill is exercised realistically
+        await asyncio.sleep(args.ramp * i / max(args.clients, 1))
+        await run_client(url, stream, args, result)
+
+    started = time.monotonic()
+    await asyncio.gather(*(delayed(i) for i in range(args.clients)))
+    elapsed = time.monotonic() - started
+    latencies = result["alert_latencies_ms"]
+    return {
+        "handler": args.handler,
+        "framing": "binary" if args.binary else "json",
+        "clients": args.clients,
+        "sessions_sustained": result["sustained"],
+        "client_frames_per_s": round(result["frames_sent"] / elapsed, 1),
+        "pain_frames": result["pain_frames"],
+        "alerts_received": len(latencies),
+        "alerts_missed": result["pain_frames"] - len(latencies),
+        "alert_latency_ms": {"p50": percentile(latencies, 50), "p99": percentile(latencies, 99)},
+        "errors": sorted(set(result["errors"]))[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds each client streams")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which clients connect")
+    parser.add_argument("--handler", choices=sorted(ROUTES), default="text",
+                        help="text: main.websocket_endpoint; tool: live_monitor.manage_live_safety_session")
+    parser.add_argument("--binary", action="store_true", help="Use the binary media subprotocol instead of JSON + base64")
+    parser.add_argument("--fps", type=float, default=1.0)
+    parser.add_argument("--pain-every", type=int, default=5, help="Mark every Nth frame as pain (0 disables)")
+    parser.add_argument("--alert-timeout", type=float, default=5.0, help="Seconds before a pain frame counts as missed")
+    parser.add_argument("--recording", help="Directory with *.jpg frames and audio.pcm")
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--upstream-connect-ms", type=float, default=1500)
+    parser.add_argument("--upstream-send-ms", type=float, default=0)
+    parser.add_argument("--upstream-response-ms", type=float, default=300)
+    parser.add_argument("--chatter-every", type=int, default=10, help="Fake model replies with plain text every N frames")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(serve(args))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            ANALYSIS_JOB_DIR=os.path.join(tmp, "jobs"),
+            GEMINI_API_KEY="bench-fake-key",
+            PRELOAD_GENAI_SDK="false",
+        )
+        server_argv = [a for a in sys.argv[1:] if a != "--json"]
+        client_report, server_report = run_with_server(
+            "backend.benchmarks.bench_live", server_argv, env, lambda port: drive(args, port),
+        )
+    report = {**client_report, **server_report}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        print(f"{key:<28} {value}")
+
+
+if __name__ == "__main__":
+    main()
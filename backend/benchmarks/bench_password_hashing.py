@@ -0,0 +1,63 @@
+"""
+Logins per second through PasswordHasher at different work factors and pool sizes.
+
+    python -m backend.benchmarks.bench_password_hashing --rounds 10 11 12 --workers 1 2 4 --logins 200
+"""
+import time
+import asyncio
+import argparse
+
+from ..password_hashing import PasswordHasher, HashingBusy, _hash_password
+
+PASSWORD = "correct horse battery staple"
+
+
+async def run(rounds: int, workers: int, logins: int, concurrency: int, max_pending: int) -> dict:
+    hasher = PasswordHasher(workers=workers, max_pending=max_pending, rounds=rounds)
+    hashed = _hash_password(PASSWORD, rounds)
+    # Warm the pool so process spawn time isn't counted
+    await asyncio.gather(*(hasher.verify(PASSWORD, hashed) for _ in range(workers)))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    rejected = 0
+
+    async def one_login():
+        nonlocal rejected
+        async with semaphore:
+            try:
+                assert await hasher.verify(PASSWORD, hashed)
+            except HashingBusy:
+                rejected += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+    return {
+        "rounds": rounds,
+        "workers": workers,
+        "logins": logins,
+        "rejected": rejected,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round((logins - rejected) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32, help="Simultaneous login attempts")
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'workers':>7} {'logins/s':>9} {'rejected':>8} {'seconds':>8}")
+    for rounds in args.rounds:
+        for workers in args.workers:
+            r = asyncio.run(run(rounds, workers, args.logins, args.concurrency, args.max_pending))
+            print(f"{r['rounds']:>6} {r['workers']:>7} {r['logins_per_second']:>9} {r['rejected']:>8} {r['seconds']:>8}")
+
+
+if __name__ == "__main__":
+    main()
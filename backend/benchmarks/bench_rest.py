@@ -0,0 +1,254 @@
+"""
+Throughput and latency of the main REST endpoints against a seeded throwaway database.
+
+The app runs in a subprocess against a temporary SQLite file (or --database-url,
+e.g. a scratch Postgres), seeded with patients, session history and
+appointments. The upstream analyzer is replaced by a stub with configurable
+latency. Each endpoint is then driven at --concurrency for --duration seconds.
+
+    python -m backend.benchmarks.bench_rest --users 500 --concurrency 32 --duration 15 --output bench.json
+
+The JSON report (stdout with --json, or --output) carries the git commit and
+parameters, so runs from different commits can be diffed directly.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+from .server_harness import REPO_ROOT, percentile, serve_until_stdin_closes, run_with_server
+
+PASSWORD = "bench-password"
+ACTIVITIES = ["Squats", "Lunges", "Shoulder Press", "Hamstring Stretch", "Bridge"]
+ENDPOINTS = ["login", "users_me", "stats", "appointments", "analyze"]
+
+
+def user_email(i: int) -> str:
+    return f"bench-patient-{i}@example.com"
+
+
+# --- SERVER SIDE (subprocess) ---
+
+def seed(main, users: int, sessions_per_user: int, rounds: int):
+    """Patients with history spread over the last 90 days, written through the real stats path."""
+    from sqlmodel import Session
+    from ..password_hashing import _hash_password
+
+    rng = random.Random(0)
+    hashed = _hash_password(PASSWORD, rounds) # bcrypt once; every patient shares it
+    now = datetime.utcnow()
+    with Session(main.engine) as session:
+        patients = [main.User(email=user_email(i), hashed_password=hashed, full_name=f"Bench Patient {i}") for i in range(users)]
+        session.add_all(patients)
+        session.commit()
+        ids = [patient.id for patient in patients]
+        for user_id in ids:
+            for k in range(3):
+                starts_at = now + timedelta(days=rng.randint(1, 30), hours=k)
+                session.add(main.Appointment(
+                    user_id=user_id, title="Follow-up", doctor="Dr. Bench",
+                    date_str=starts_at.strftime("%b %d"), time_str=starts_at.strftime("%I:%M %p"),
+                    type=rng.choice(["Video Call", "In-person"]), starts_at=starts_at,
+                ))
+        session.commit()
+
+    batch = []
+    for user_id in ids:
+        for _ in range(sessions_per_user):
+            batch.append({
+                "user_id": user_id,
+                "activity_name": rng.choice(ACTIVITIES),
+                "result": {
+                    "score": rng.randint(40, 100),
+                    "pain_detected": rng.random() < 0.15,
+                    "fatigue_observed": rng.random() < 0.3,
+                    "summary": "Seeded session",
+                },
+                "created_at": now - timedelta(days=rng.uniform(0, 90)),
+            })
+    batch.sort(key=lambda item: item["created_at"])
+    for start in range(0, len(batch), 1000):
+        main.write_stats_batch(batch[start:start + 1000])
+
+def stub_analyzer(latency: float):
+    async def analyze_video_file_async(video_file, size: int, activity_name: str, mime_type: str, on_field=None) -> dict:
+        await asyncio.sleep(latency)
+        result = {
+            "score": 82,
+            "summary": f"Stubbed analysis of {activity_name}",
+            "pain_detected": False,
+            "pain_timestamp": "N/A",
+            "fatigue_observed": False,
+            "corrections": ["Keep your back straight"],
+        }
+        if on_field:
+            for name, value in result.items():
+                on_field(name, value)
+        return result
+    return analyze_video_file_async
+
+async def serve(args):
+    from .. import main
+
+    main.init_db()
+    started = time.monotonic()
+    seed(main, args.users, args.sessions_per_user, args.bcrypt_rounds)
+    seed_seconds = time.monotonic() - started
+    # run_file_analysis resolves this module global per call
+    main.analyze_video_file_async = stub_analyzer(args.analyze_latency_ms / 1000)
+
+    await serve_until_stdin_closes(main.app, args.port)
+    print(json.dumps({
+        "seed_seconds": round(seed_seconds, 1),
+        "analysis_cache": main.analysis_cache.stats(),
+        "stats_flushed": main.stats_writer.flushed,
+    }))
+
+
+# --- CLIENT SIDE ---
+
+async def login(client, email: str):
+    return await client.post("/auth/login", data={"username": email, "password": PASSWORD})
+
+async def run_endpoint(client, name: str, tokens: list, args) -> dict:
+    video = os.urandom(args.video_bytes)
+    latencies, errors, statuses = [], 0, {}
+    deadline = time.monotonic() + args.duration
+
+    async def one_request(worker: int, n: int):
+        token = tokens[(worker + n) % len(tokens)]
+        headers = {"Authorization": f"Bearer {token}"}
+        if name == "login":
+            return await login(client, user_email(random.randrange(args.users)))
+        if name == "users_me":
+            return await client.get("/users/me", headers=headers)
+        if name == "stats":
+            return await client.get("/stats", headers=headers)
+        if name == "appointments":
+            return await client.get("/appointments", headers=headers)
+        # Unique payloads miss the analysis cache unless --cache-hits
+        payload = video if args.cache_hits else video[:-8] + n.to_bytes(4, "little") + worker.to_bytes(4, "little")
+        body = {"base64_video": base64.b64encode(payload).decode("ascii"), "activity_name": random.choice(ACTIVITIES)}
+        return await client.post("/analyze", json=body, headers=headers)
+
+    async def worker(index: int):
+        nonlocal errors
+        n = 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await one_request(index, n)
+                code = response.status_code
+            except Exception as e:
+                code = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(code)] = statuses.get(str(code), 0) + 1
+            if not (isinstance(code, int) and code < 400):
+                errors += 1
+            n += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.monotonic() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": round(max(latencies, default=0.0), 1),
+        },
+    }
+
+async def drive(args, port: int) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        # Tokens for a spread of patients, so /users/me and /stats don't all hit one cached user
+        sample = range(min(args.users, max(args.concurrency, 16)))
+        responses = await asyncio.gather(*(login(client, user_email(i)) for i in sample))
+        tokens = [r.json()["access_token"] for r in responses if r.status_code == 200]
+        if not tokens:
+            raise SystemExit(f"❌ Could not log in seeded users: {responses[0].status_code} {responses[0].text}")
+
+        results = {}
+        for name in args.endpoints:
+            results[name] = await run_endpoint(client, name, tokens, args)
+            print(f"  {name:<14} {results[name]['req_per_s']:>8} req/s  p50 {results[name]['latency_ms']['p50']} ms  p99 {results[name]['latency_ms']['p99']} ms", file=sys.stderr)
+        return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--sessions-per-user", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--analyze-latency-ms", type=float, default=500, help="Stubbed upstream latency")
+    parser.add_argument("--video-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--cache-hits", action="store_true", help="Send the same video every time")
+    parser.add_argument("--bcrypt-rounds", type=int, default=int(os.getenv("BCRYPT_ROUNDS", "12")))
+    parser.add_argument("--database-url", help="Scratch database to use instead of a temporary SQLite file")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--json", action="store_true", help="Print the JSON report to stdout")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(serve(args))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            ANALYSIS_JOB_DIR=os.path.join(tmp, "jobs"),
+            BCRYPT_ROUNDS=str(args.bcrypt_rounds),
+            PRELOAD_GENAI_SDK="false",
+        )
+        server_argv = [a for a in sys.argv[1:] if a not in ("--json",)]
+        results, server_report = run_with_server(
+            "backend.benchmarks.bench_rest", server_argv, env, lambda port: drive(args, port),
+        )
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "params": {k: v for k, v in vars(args).items() if k not in ("serve", "port", "output", "json", "database_url")},
+        "database": "custom" if args.database_url else "sqlite",
+        "endpoints": results,
+        "server": server_report,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    elif not args.output:
+        print(f"{'endpoint':<14} {'req/s':>9} {'p50':>8} {'p90':>8} {'p99':>8} {'errors':>7}")
+        for name, r in results.items():
+            ms = r["latency_ms"]
+            print(f"{name:<14} {r['req_per_s']:>9} {ms['p50']:>8} {ms['p90']:>8} {ms['p99']:>8} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
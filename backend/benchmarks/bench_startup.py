@@ -0,0 +1,123 @@
+"""
+Cold import time of `backend.main`, measured in fresh interpreters with -X importtime.
+
+Fails (exit 1) when the median exceeds the budget or when a module that should
+load lazily was imported eagerly, so it can run as a regression check:
+
+    python -m backend.benchmarks.bench_startup --runs 5 --budget-ms 1500
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+# --- CONFIG ---
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500"))
+
+# Must only be imported on first analysis / WebSocket / Google login / hash
+# (not "bcrypt" itself: PyJWT -> cryptography's ssh serialization imports it unconditionally)
+DEFERRED_MODULES = ["google.genai", "google.auth", "google.oauth2", "passlib", "httpx", "requests"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "eager": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Cumulative microseconds per top-level package from -X importtime output.
+
+    Entries are indented two spaces per nesting level and printed after their
+    children. A package is charged the cumulative time of each entry imported
+    from outside it (its outermost entries); imports between its own
+    submodules are already inside those totals.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue # header row
+        name = name.rstrip()[1:] # drop the separator's space
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip().split(".")[0], int(cumulative)))
+
+    totals = {}
+    roots_by_depth = []
+    # Reversed, parents come before their children
+    for depth, root, cumulative in reversed(entries):
+        del roots_by_depth[depth:]
+        parent = roots_by_depth[-1] if roots_by_depth else None
+        roots_by_depth.append(root)
+        if root != parent:
+            totals[root] = totals.get(root, 0) + cumulative
+    return totals
+
+
+def run_once(env: dict) -> tuple:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(deferred=DEFERRED_MODULES)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"❌ import backend.main failed (exit {proc.returncode})")
+    # The probe's JSON is the last stdout line
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result, parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="Heaviest top-level packages to list")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Never touch the developer's database, even though import no longer creates tables
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}")
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    timings = [r["ms"] for r, _ in runs]
+    eager = sorted({m for r, _ in runs for m in r["eager"]})
+    median = statistics.median(timings)
+    # Package breakdown from the fastest run (least noise)
+    _, packages = min(runs, key=lambda run: run[0]["ms"])
+    heaviest = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+    ok = median <= args.budget_ms and not eager
+
+    if args.json:
+        print(json.dumps({
+            "median_ms": round(median, 1),
+            "min_ms": round(min(timings), 1),
+            "max_ms": round(max(timings), 1),
+            "budget_ms": args.budget_ms,
+            "eager_imports": eager,
+            "heaviest_packages_ms": {name: round(us / 1000, 1) for name, us in heaviest},
+            "ok": ok,
+        }, indent=2))
+    else:
+        print(f"import backend.main: median {median:.0f} ms (min {min(timings):.0f}, max {max(timings):.0f}) over {args.runs} runs, budget {args.budget_ms:.0f} ms")
+        print(f"{'package':<24} {'cumulative ms':>14}")
+        for name, us in heaviest:
+            print(f"{name:<24} {us / 1000:>14.1f}")
+        if eager:
+            print(f"❌ Imported eagerly: {', '.join(eager)}")
+        print("✅ Within budget" if ok else "❌ Startup regression")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
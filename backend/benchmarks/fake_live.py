@@ -0,0 +1,93 @@
+"""
+Local stand-in for a Gemini live session, for load tests without Google credentials.
+
+It accepts media through `send()` like the SDK session and answers through
+`receive()` with the same response shape (server_content.model_turn.parts).
+Frames carrying PAIN_MARKER are answered with a scripted alert after
+`response_latency`: the text 'PAIN_DETECTED' or, in tool mode, a
+trigger_pain_alert function call.
+"""
+import asyncio
+from types import SimpleNamespace
+from typing import Optional
+
+# Appended after a JPEG's EOI marker: decoders ignore it, the fake model doesn't
+PAIN_MARKER = b"PHYSIOVIBE-BENCH-PAIN"
+
+
+def _response(text: Optional[str] = None, function_call=None):
+    part = SimpleNamespace(text=text, function_call=function_call, inline_data=None)
+    return SimpleNamespace(server_content=SimpleNamespace(model_turn=SimpleNamespace(parts=[part])))
+
+
+class FakeLiveStats:
+    """Counters shared by every fake session in a run."""
+
+    def __init__(self):
+        self.connects = 0
+        self.media_sent = 0
+        self.alerts_scripted = 0
+
+
+class FakeLiveSession:
+    def __init__(self, stats: FakeLiveStats, mode: str, send_latency: float, response_latency: float, chatter_every: int):
+        self.stats = stats
+        self.mode = mode
+        self.send_latency = send_latency
+        self.response_latency = response_latency
+        self.chatter_every = chatter_every
+        self._responses = asyncio.Queue()
+        self._media = 0
+
+    async def send(self, input=None, end_of_turn: bool = False):
+        if self.send_latency:
+            # Upstream slowness: the handler's sender task waits here, not its socket reader
+            await asyncio.sleep(self.send_latency)
+        if not isinstance(input, dict):
+            return # Text prompts (live_monitor's initial instruction)
+        self._media += 1
+        self.stats.media_sent += 1
+        if PAIN_MARKER in input["data"]:
+            self.stats.alerts_scripted += 1
+            if self.mode == "tool":
+                reply = _response(function_call=SimpleNamespace(name="trigger_pain_alert", args={"severity": "High"}))
+            else:
+                reply = _response(text="PAIN_DETECTED")
+            asyncio.get_running_loop().call_later(self.response_latency, self._responses.put_nowait, reply)
+        elif self.chatter_every and self._media % self.chatter_every == 0:
+            self._responses.put_nowait(_response(text="Monitoring."))
+
+    async def receive(self):
+        # Like the SDK, each receive() call yields one turn and then ends
+        yield await self._responses.get()
+
+
+class FakeLiveConnection:
+    """Async context manager standing in for `client.aio.live.connect(...)`."""
+
+    def __init__(self, session: FakeLiveSession, connect_latency: float):
+        self.session = session
+        self.connect_latency = connect_latency
+
+    async def __aenter__(self) -> FakeLiveSession:
+        await asyncio.sleep(self.connect_latency)
+        self.session.stats.connects += 1
+        return self.session
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def fake_connect_factory(
+    stats: FakeLiveStats,
+    mode: str = "text",
+    connect_latency: float = 1.0,
+    send_latency: float = 0.0,
+    response_latency: float = 0.3,
+    chatter_every: int = 0,
+):
+    """Returns a `connect()` coroutine function usable by LiveSessionPool and manage_live_safety_session."""
+    async def connect():
+        session = FakeLiveSession(stats, mode, send_latency, response_latency, chatter_every)
+        return FakeLiveConnection(session, connect_latency)
+    return connect
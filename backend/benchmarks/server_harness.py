@@ -0,0 +1,78 @@
+"""
+Shared plumbing for benchmarks that run the app in a subprocess: the driver
+spawns `python -m <module> --serve --port N`, waits for the port, runs its
+load, then closes the server's stdin to stop it and reads the JSON summary
+the server prints as its last line.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import threading
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 1)
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+async def wait_for_port(port: int, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"❌ Server did not start on port {port}")
+
+
+async def serve_until_stdin_closes(app, port: int) -> float:
+    """Serves `app` until the driver closes our stdin. Returns the seconds served."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    # Stopping via stdin rather than a signal: uvicorn re-raises captured signals after shutdown
+    loop = asyncio.get_running_loop()
+    threading.Thread(target=lambda: (sys.stdin.read(), loop.call_soon_threadsafe(setattr, server, "should_exit", True)), daemon=True).start()
+    started = time.monotonic()
+    await server.serve()
+    return time.monotonic() - started
+
+
+def run_with_server(module: str, server_argv: list, env: dict, drive) -> tuple:
+    """
+    Starts `module` in server mode, runs `drive(port)` (a coroutine function)
+    against it and returns (drive result, server summary dict).
+    """
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", module, *server_argv, "--serve", "--port", str(port)],
+        cwd=REPO_ROOT, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        asyncio.run(wait_for_port(port))
+        result = asyncio.run(drive(port))
+    finally:
+        try:
+            stdout, _ = server.communicate(timeout=60)
+        except subprocess.TimeoutExpired:
+            # A server stuck in shutdown must not outlive the benchmark
+            server.kill()
+            stdout, _ = server.communicate()
+            print(f"⚠️ {module} server did not exit within 60s and was killed", file=sys.stderr)
+    lines = [line for line in stdout.splitlines() if line.startswith("{")]
+    return result, (json.loads(lines[-1]) if lines else {"server": "no summary (crashed?)"})
@@ -0,0 +1,57 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# --- CONFIG ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _tune_sqlite(engine):
+    """WAL lets readers run alongside the single writer; NORMAL sync is durable enough under WAL."""
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+def _pool_args(url: str) -> dict:
+    args = {"pool_pre_ping": True, "pool_recycle": DB_POOL_RECYCLE}
+    # In-memory SQLite uses a single-connection pool that takes no sizing arguments
+    if ":memory:" not in url:
+        args.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return args
+
+def async_database_url(url: str) -> str:
+    """Maps a sync database URL onto its async driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql+psycopg2:"):
+        return url.replace("postgresql+psycopg2:", "postgresql+asyncpg:", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    return url
+
+def create_db_engine(url: str, tune_sqlite: bool = True):
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args, **_pool_args(url))
+    if url.startswith("sqlite") and tune_sqlite:
+        _tune_sqlite(engine)
+    return engine
+
+def create_async_db_engine(url: str, tune_sqlite: bool = True):
+    url = async_database_url(url)
+    engine = create_async_engine(url, **_pool_args(url))
+    if url.startswith("sqlite") and tune_sqlite:
+        _tune_sqlite(engine.sync_engine)
+    return engine
+
+def create_async_session_factory(async_engine):
+    return async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
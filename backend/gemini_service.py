@@ -1,21 +1,119 @@
 import os
 import json
 import base64
-import httpx
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
+import asyncio
+import logging
+from typing import Any, Callable, Optional, TYPE_CHECKING
 
-load_dotenv(dotenv_path=".env.local")
+from .metrics import ANALYZE_STAGE_SECONDS, UPSTREAM_PAYLOAD_BYTES, UPSTREAM_ERRORS
+from .app_logging import get_event_logger, log_payload
+from .json_stream import JSONFieldStream
 
-def analyze_video(base64_video: str, activity_name: str, mime_type: str = "video/webm"):
+# httpx and the GenAI SDK are imported on first use; they dominate `import backend.main` otherwise
+if TYPE_CHECKING:
+    import httpx
+    from google import genai
+
+logger = logging.getLogger(__name__)
+live_events = get_event_logger(__name__)
+
+# --- UPSTREAM CONFIG ---
+SDK_MODEL_ID = "gemini-3-pro-preview" # User-specified model
+# Bump whenever the prompt or response schema changes (part of the analysis cache key)
+PROMPT_VERSION = "1"
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "60"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+# Raw video read per base64 chunk when streaming uploads (multiple of 3 so only the last chunk pads)
+_STREAM_CHUNK_BYTES = 3 * 256 * 1024
+
+# Receives (field name, value) as streamed analysis fields complete
+FieldCallback = Callable[[str, Any], None]
+
+# App-lifetime clients (created lazily, closed by close_clients on shutdown)
+_async_http_client: Optional["httpx.AsyncClient"] = None
+_genai_clients = {}
+
+ANALYSIS_SCHEMA = {
+    "type": "OBJECT", # Use string for direct JSON payload compatibility
+    "properties": {
+        "score": {"type": "NUMBER", "description": "A score from 0-100 rating the form quality."},
+        "summary": {"type": "STRING", "description": "Empathetic clinical summary of the session."},
+        "pain_detected": {"type": "BOOLEAN", "description": "Whether pain signals were detected."},
+        "pain_timestamp": {"type": "STRING", "description": "Timestamp string or 'N/A'."},
+        "fatigue_observed": {"type": "BOOLEAN", "description": "Whether form degradation was observed."},
+        "corrections": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "List of actionable corrections."},
+    },
+    "required": ["score", "summary", "pain_detected", "pain_timestamp", "fatigue_observed", "corrections"],
+}
+
+# SDK-specific schema (plain strings validate into types.Type, so the SDK isn't needed to build it)
+SDK_ANALYSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "NUMBER", "description": "Score 0-100"},
+        "summary": {"type": "STRING", "description": "Summary"},
+        "pain_detected": {"type": "BOOLEAN", "description": "Pain detected"},
+        "pain_timestamp": {"type": "STRING", "description": "Timestamp"},
+        "fatigue_observed": {"type": "BOOLEAN", "description": "Fatigue"},
+        "corrections": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "Corrections"},
+    },
+    "required": ["score", "summary", "pain_detected", "pain_timestamp", "fatigue_observed", "corrections"],
+}
+
+
+# --- SHARED CLIENTS ---
+
+def get_async_http_client() -> "httpx.AsyncClient":
     """
-    Analyzes a video using either a custom Gemini endpoint (Vertex AI) or the standard Google GenAI SDK.
+    Returns the app-lifetime AsyncClient used for the custom endpoint.
+    Connections are kept alive and multiplexed over HTTP/2 when `h2` is installed.
     """
-    print(f"Current working directory: {os.getcwd()}")
-    
-    # 1. Configuration & Sanitization
-    
+    import httpx
+
+    global _async_http_client
+    if _async_http_client is None or _async_http_client.is_closed:
+        limits = httpx.Limits(
+            max_connections=UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+        )
+        try:
+            _async_http_client = httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT_SECONDS, limits=limits, http2=True)
+        except ImportError:
+            logger.warning("'h2' not installed, custom endpoint client falling back to HTTP/1.1")
+            _async_http_client = httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT_SECONDS, limits=limits)
+    return _async_http_client
+
+def get_genai_client(api_key: str, api_version: Optional[str] = None) -> "genai.Client":
+    """Returns a shared genai.Client per API key (and API version) so its connection pool is reused across requests."""
+    from google import genai
+
+    client = _genai_clients.get((api_key, api_version))
+    if client is None:
+        http_options = {"api_version": api_version} if api_version else None
+        client = genai.Client(api_key=api_key, http_options=http_options)
+        _genai_clients[(api_key, api_version)] = client
+    return client
+
+def preload_sdk():
+    """Imports the upstream clients ahead of the first analysis. Blocking; run it in a thread."""
+    import httpx
+    from google.genai import types
+
+async def close_clients():
+    """Closes the shared upstream clients. Called from the app lifespan on shutdown."""
+    global _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    _genai_clients.clear()
+
+
+# --- REQUEST HELPERS ---
+
+def sanitize_base64(base64_video: str) -> str:
     # Sanitize base64 string (Robust method)
     if "," in base64_video:
         base64_video = base64_video.split(",")[-1]
@@ -23,18 +121,19 @@ def analyze_video(base64_video: str, activity_name: str, mime_type: str = "video
     padding = len(base64_video) % 4
     if padding:
         base64_video += "=" * (4 - padding)
-    print(f"Base64 video length: {len(base64_video)}")
+    logger.debug("Base64 video length: %d", len(base64_video))
+    return base64_video
 
-    # Prompt Construction
-    prompt_text = f"""You are a World-Class Biomechanics Expert and Physical Therapist with 'Clinical Empathy'. 
+def _build_prompt(activity_name: str) -> str:
+    return f"""You are a World-Class Biomechanics Expert and Physical Therapist with 'Clinical Empathy'.
     The user is performing: "{activity_name}".
-    
+
     TASK: Analyze this video/audio stream and return a STRICT JSON object.
-    
+
     Use ANY visual or audio cues to fill this EXACT structure:
-    
+
     {{
-        "pain_events": [ {{"timestamp": "MM:SS", "description": "wincing/groaning"}} ], 
+        "pain_events": [ {{"timestamp": "MM:SS", "description": "wincing/groaning"}} ],
         "temporal_reasoning": {{
             "consistency": "Consistent or Degrading",
             "fatigue_signs": "Trembling/Slowing down or None observed",
@@ -51,229 +150,333 @@ def analyze_video(base64_video: str, activity_name: str, mime_type: str = "video
         }}
     }}"""
 
-    analysis_schema = {
-        "type": "OBJECT", # Use string for direct JSON payload compatibility
-        "properties": {
-            "score": {"type": "NUMBER", "description": "A score from 0-100 rating the form quality."},
-            "summary": {"type": "STRING", "description": "Empathetic clinical summary of the session."},
-            "pain_detected": {"type": "BOOLEAN", "description": "Whether pain signals were detected."},
-            "pain_timestamp": {"type": "STRING", "description": "Timestamp string or 'N/A'."},
-            "fatigue_observed": {"type": "BOOLEAN", "description": "Whether form degradation was observed."},
-            "corrections": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "List of actionable corrections."},
-        },
-        "required": ["score", "summary", "pain_detected", "pain_timestamp", "fatigue_observed", "corrections"],
-    }
-
-    # 2. Dual-Mode Execution
-    
+def _get_custom_endpoint():
+    """Returns (endpoint, key) for the custom Vertex endpoint, or (None, None) when not configured."""
     custom_endpoint = os.environ.get("GEMINI_CUSTOM_ENDPOINT")
     # Use dedicated custom key if available, otherwise fallback to standard keys
     custom_key = os.environ.get("GEMINI_CUSTOM_KEY")
     if not custom_key:
         custom_key = os.environ.get("VITE_GEMINI_API_KEY") or os.environ.get("GOOGLE_CLOUD_API_KEY") or os.environ.get("GEMINI_API_KEY")
+    if custom_endpoint and custom_key:
+        return custom_endpoint, custom_key
+    return None, None
+
+def current_model_id() -> str:
+    """Identifies the upstream model that analyze_video would call right now."""
+    custom_endpoint, _ = _get_custom_endpoint()
+    return custom_endpoint or SDK_MODEL_ID
+
+def _get_sdk_api_key() -> str:
+    # Prioritize VITE_GEMINI_API_KEY
+    api_key = os.environ.get("VITE_GEMINI_API_KEY") or os.environ.get("GOOGLE_CLOUD_API_KEY") or os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("No valid API Key found (VITE_GEMINI_API_KEY, GOOGLE_CLOUD_API_KEY, or GEMINI_API_KEY)")
+    return api_key
+
+def _build_custom_payload(base64_video: str, mime_type: str, prompt_text: str) -> dict:
+    # Construct Payload for Vertex AI REST API
+    # Note: Vertex AI expects specific JSON structure.
+    logger.debug("Custom payload: mime=%s, text_len=%d", mime_type, len(prompt_text))
+    payload = {
+        "contents": [
+            {
+                "role": "user",
+                "parts": [
+                    {"inlineData": {"mimeType": mime_type, "data": base64_video}},
+                    {"text": prompt_text}
+                ]
+            }
+        ]
+    }
+    # RE-ADDING generationConfig to fix TRUNCATED JSON
+    payload["generationConfig"] = {
+        "maxOutputTokens": 8192,
+        "temperature": 1,
+        "topP": 0.95
+    }
+    return payload
+
+def _parse_custom_response(response: "httpx.Response") -> dict:
+    if response.status_code != 200:
+        logger.error("Custom API Error %s", response.status_code)
+        log_payload(logger, "Custom API error body", response.text)
+        raise ValueError(f"Custom API Error: {response.text}")
+
+    # Parse Vertex Response
+    data = response.json()
+    full_text = ""
+
+    # Handle Streaming Response (List of chunks)
+    if isinstance(data, list):
+        for chunk in data:
+            if "candidates" in chunk and chunk["candidates"]:
+                candidate = chunk["candidates"][0]
+                if "content" in candidate and "parts" in candidate["content"]:
+                    full_text += candidate["content"]["parts"][0]["text"]
+
+    # Handle Non-Streaming Response (Single Dict)
+    elif isinstance(data, dict):
+         if "candidates" in data and data["candidates"]:
+            candidate = data["candidates"][0]
+            if "content" in candidate and "parts" in candidate["content"]:
+                full_text = candidate["content"]["parts"][0]["text"]
+
+    if not full_text:
+         raise ValueError("No content in Custom API response")
+
+    # Raw response, to catch formatting issues (LOG_PAYLOADS=true)
+    log_payload(logger, "Raw Vertex response", full_text)
+
+    # Clean Markdown Code Blocks (common cause of JSON errors)
+    text_response = full_text.replace("```json", "").replace("```", "").strip()
+
+    return json.loads(text_response)
+
+def _build_sdk_request(video_bytes: bytes, mime_type: str, prompt_text: str):
+    from google.genai import types
+
+    contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_bytes(data=video_bytes, mime_type=mime_type),
+                types.Part.from_text(text=prompt_text)
+            ]
+        )
+    ]
+
+    generate_content_config = types.GenerateContentConfig(
+        temperature = 1,
+        top_p = 0.95,
+        max_output_tokens = 8192,
+        response_mime_type="application/json",
+        response_schema=SDK_ANALYSIS_SCHEMA,
+        safety_settings = [
+            types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="OFF"),
+            types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="OFF"),
+            types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"),
+            types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF")
+        ],
+        tools = [types.Tool(google_search=types.GoogleSearch())],
+        thinking_config=types.ThinkingConfig(thinking_level="HIGH"),
+    )
+    return contents, generate_content_config
+
+def _parse_sdk_response(response_text: str) -> dict:
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        logger.error("Failed to parse JSON (%d chars)", len(response_text))
+        log_payload(logger, "Unparseable SDK response", response_text)
+        raise ValueError("AI returned invalid JSON")
+
+
+# --- ANALYSIS ---
+
+def analyze_video(base64_video: str, activity_name: str, mime_type: str = "video/webm"):
+    """
+    Analyzes a video using either a custom Gemini endpoint (Vertex AI) or the standard Google GenAI SDK.
+    """
+    logger.debug("Current working directory: %s", os.getcwd())
+
+    # 1. Configuration & Sanitization
+    base64_video = sanitize_base64(base64_video)
+    prompt_text = _build_prompt(activity_name)
+
+    # 2. Dual-Mode Execution
+    custom_endpoint, custom_key = _get_custom_endpoint()
 
     # --- CASE A: Custom Endpoint (Vertex AI Proxy/Direct) ---
-    if custom_endpoint and custom_key:
-        print(f"Using CUSTOM ENDPOINT: {custom_endpoint[:30]}...")
+    if custom_endpoint:
+        logger.info("Using custom endpoint: %s...", custom_endpoint[:30])
         try:
-            # Construct Payload for Vertex AI REST API
-            # Note: Vertex AI expects specific JSON structure.
-            # Using 'httpx' synchronously here to match synchronous FastAPI route.
-            
+            # Using 'httpx' synchronously here to match synchronous callers (scripts).
+            import httpx
+
             url = f"{custom_endpoint}?key={custom_key}"
-            
-            print(f"DEBUG PAYLOAD: mime={mime_type}, text_len={len(prompt_text)}")
-            payload = {
-                "contents": [
-                    {
-                        "role": "user",
-                        "parts": [
-                            {"inlineData": {"mimeType": mime_type, "data": base64_video}},
-                            {"text": prompt_text} 
-                        ]
-                    }
-                ]
-            }
-            # STRICT DEBUGGING: Manually force video/mp4 purely to test if webm is the issue, though user sent mp4 in postman.
-            # And commented out text prompt to MATCH POSTMAN EXACTLY.
-            # RE-ADDING generationConfig to fix TRUNCATED JSON
-            payload["generationConfig"] = {
-                "maxOutputTokens": 8192,
-                "temperature": 1,
-                "topP": 0.95
-            }
-            
-            with httpx.Client(timeout=60.0) as client:
+            payload = _build_custom_payload(base64_video, mime_type, prompt_text)
+
+            with httpx.Client(timeout=UPSTREAM_TIMEOUT_SECONDS) as client:
                 response = client.post(url, json=payload)
-                
-                if response.status_code != 200:
-                    print(f"Custom API Error {response.status_code}: {response.text}")
-                    raise ValueError(f"Custom API Error: {response.text}")
-                
-                # Parse Vertex Response
-                data = response.json()
-                full_text = ""
-
-                # Handle Streaming Response (List of chunks)
-                if isinstance(data, list):
-                    for chunk in data:
-                        if "candidates" in chunk and chunk["candidates"]:
-                            candidate = chunk["candidates"][0]
-                            if "content" in candidate and "parts" in candidate["content"]:
-                                full_text += candidate["content"]["parts"][0]["text"]
-                
-                # Handle Non-Streaming Response (Single Dict)
-                elif isinstance(data, dict):
-                     if "candidates" in data and data["candidates"]:
-                        candidate = data["candidates"][0]
-                        if "content" in candidate and "parts" in candidate["content"]:
-                            full_text = candidate["content"]["parts"][0]["text"]
-                
-                if not full_text:
-                     raise ValueError("No content in Custom API response")
-
-                # DEBUG: Print raw response to catch formatting issues
-                print(f"RAW VERTEX RESPONSE: {full_text}")
-                
-                # Clean Markdown Code Blocks (common cause of JSON errors)
-                text_response = full_text.replace("```json", "").replace("```", "").strip()
-                
-                return json.loads(text_response)
+                return _parse_custom_response(response)
 
         except Exception as e:
-            print(f"Custom Endpoint Failed: {e}")
+            logger.error("Custom endpoint failed: %s", e)
             raise e
 
     # --- CASE B: Standard Gemini SDK (Fallback) ---
     else:
-        print("Using STANDARD Gemini SDK")
-        
-        # Prioritize VITE_GEMINI_API_KEY
-        api_key = os.environ.get("VITE_GEMINI_API_KEY") or os.environ.get("GOOGLE_CLOUD_API_KEY") or os.environ.get("GEMINI_API_KEY")
-        
-        if not api_key:
-            raise ValueError("No valid API Key found (VITE_GEMINI_API_KEY, GOOGLE_CLOUD_API_KEY, or GEMINI_API_KEY)")
-
-        client = genai.Client(api_key=api_key)
-        model = "gemini-3-pro-preview" # User-specified model
-
-        # SDK-specific schema (using types directly)
-        sdk_analysis_schema = {
-            "type": types.Type.OBJECT,
-            "properties": {
-                "score": {"type": types.Type.NUMBER, "description": "Score 0-100"},
-                "summary": {"type": types.Type.STRING, "description": "Summary"},
-                "pain_detected": {"type": types.Type.BOOLEAN, "description": "Pain detected"},
-                "pain_timestamp": {"type": types.Type.STRING, "description": "Timestamp"},
-                "fatigue_observed": {"type": types.Type.BOOLEAN, "description": "Fatigue"},
-                "corrections": {"type": types.Type.ARRAY, "items": {"type": types.Type.STRING}, "description": "Corrections"},
-            },
-            "required": ["score", "summary", "pain_detected", "pain_timestamp", "fatigue_observed", "corrections"],
-        }
-
-        contents = [
-            types.Content(
-                role="user",
-                parts=[
-                    types.Part.from_bytes(data=base64.b64decode(base64_video), mime_type=mime_type),
-                    types.Part.from_text(text=prompt_text)
-                ]
-            )
-        ]
-
-        generate_content_config = types.GenerateContentConfig(
-            temperature = 1,
-            top_p = 0.95,
-            max_output_tokens = 8192,
-            response_mime_type="application/json",
-            response_schema=sdk_analysis_schema,
-            safety_settings = [
-                types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="OFF"),
-                types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="OFF"),
-                types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"),
-                types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF")
-            ],
-            tools = [types.Tool(google_search=types.GoogleSearch())],
-            thinking_config=types.ThinkingConfig(thinking_level="HIGH"),
-        )
+        logger.info("Using standard Gemini SDK")
+        client = get_genai_client(_get_sdk_api_key())
+        contents, generate_content_config = _build_sdk_request(base64.b64decode(base64_video), mime_type, prompt_text)
 
         response_text = ""
         for chunk in client.models.generate_content_stream(
-            model = model,
+            model = SDK_MODEL_ID,
             contents = contents,
             config = generate_content_config,
         ):
             if chunk.text:
                 response_text += chunk.text
-                
-        try:
-            return json.loads(response_text)
-        except json.JSONDecodeError:
-            print(f"Failed to parse JSON: {response_text}")
-            raise ValueError("AI returned invalid JSON")
+
+        return _parse_sdk_response(response_text)
+
+async def _post_custom_async(custom_endpoint: str, custom_key: str, **request_kwargs) -> dict:
+    logger.info("Using custom endpoint (async): %s...", custom_endpoint[:30])
+    try:
+        url = f"{custom_endpoint}?key={custom_key}"
+        with ANALYZE_STAGE_SECONDS.time("upstream"):
+            response = await get_async_http_client().post(url, **request_kwargs)
+        with ANALYZE_STAGE_SECONDS.time("parse"):
+            return _parse_custom_response(response)
+
+    except Exception as e:
+        UPSTREAM_ERRORS.inc("analyze", type(e).__name__)
+        logger.error("Custom endpoint failed: %s", e)
+        raise e
+
+async def _generate_sdk_async(video_bytes: bytes, mime_type: str, prompt_text: str, on_field: Optional[FieldCallback] = None) -> dict:
+    logger.info("Using standard Gemini SDK (async)")
+    client = get_genai_client(_get_sdk_api_key())
+    contents, generate_content_config = _build_sdk_request(video_bytes, mime_type, prompt_text)
+
+    response_text = ""
+    fields = JSONFieldStream() if on_field else None
+    try:
+        with ANALYZE_STAGE_SECONDS.time("upstream"):
+            async for chunk in await client.aio.models.generate_content_stream(
+                model = SDK_MODEL_ID,
+                contents = contents,
+                config = generate_content_config,
+            ):
+                if chunk.text:
+                    response_text += chunk.text
+                    if fields is not None:
+                        for name, value in fields.feed(chunk.text):
+                            on_field(name, value)
+    except Exception as e:
+        UPSTREAM_ERRORS.inc("analyze", type(e).__name__)
+        raise
+
+    with ANALYZE_STAGE_SECONDS.time("parse"):
+        return _parse_sdk_response(response_text)
+
+def _stream_custom_payload(video_file, size: int, mime_type: str, prompt_text: str):
+    """
+    Builds the custom endpoint JSON body as an async byte stream, base64-encoding the video
+    chunk by chunk from `video_file`. Returns (content_length, stream).
+    """
+    placeholder = "__VIDEO_DATA__"
+    payload = _build_custom_payload(placeholder, mime_type, prompt_text)
+    head, tail = json.dumps(payload).encode("utf-8").split(json.dumps(placeholder).encode("utf-8"))
+    encoded_size = 4 * ((size + 2) // 3)
+
+    async def stream():
+        yield head + b'"'
+        video_file.seek(0)
+        while True:
+            chunk = await asyncio.to_thread(video_file.read, _STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield base64.b64encode(chunk)
+        yield b'"' + tail
+
+    return len(head) + 2 + encoded_size + len(tail), stream()
+
+async def analyze_video_file_async(video_file, size: int, activity_name: str, mime_type: str = "video/webm", on_field: Optional[FieldCallback] = None):
+    """
+    Async analysis of raw video bytes held in a file-like object (e.g. a spooled upload),
+    for `async def` routes: runs on the shared pooled clients, so no threadpool worker is held
+    during the upstream round trip.
+    The custom endpoint receives a streamed body, so the base64 form never exists in memory;
+    the SDK path reads the bytes once.
+
+    On the SDK path, `on_field(name, value)` is called for each top-level result field as
+    soon as the model has finished streaming it. The custom endpoint answers in one piece,
+    so there it is never called and only the return value carries the result.
+    """
+    prompt_text = _build_prompt(activity_name)
+    UPSTREAM_PAYLOAD_BYTES.inc("analyze", amount=size)
+
+    custom_endpoint, custom_key = _get_custom_endpoint()
+
+    # --- CASE A: Custom Endpoint (Vertex AI Proxy/Direct) ---
+    if custom_endpoint:
+        content_length, body = _stream_custom_payload(video_file, size, mime_type, prompt_text)
+        headers = {"Content-Type": "application/json", "Content-Length": str(content_length)}
+        return await _post_custom_async(custom_endpoint, custom_key, content=body, headers=headers)
+
+    # --- CASE B: Standard Gemini SDK (Fallback) ---
+    video_file.seek(0)
+    video_bytes = await asyncio.to_thread(video_file.read)
+    return await _generate_sdk_async(video_bytes, mime_type, prompt_text, on_field)
 
 # --- LIVE API HANDLER (WebSocket) ---
 from fastapi import WebSocket
+from .live_window import SlidingWindowAnalyzer
+
+LIVE_WINDOW_MODEL_ID = "gemini-2.0-flash-exp" # Use 2.0 Flash Exp for best multimodal
+LIVE_WINDOW_PROMPT = "Is there any sign of physical PAIN (wincing, grimacing, moaning, screaming)? Answer purely YES or NO."
+
+async def _check_window_for_pain(client: "genai.Client", window: bytes) -> bool:
+    """One quick YES/NO check of a window of webm media (async client: never blocks the event loop)."""
+    from google.genai import types
+
+    response = await client.aio.models.generate_content(
+        model=LIVE_WINDOW_MODEL_ID,
+        contents=[
+            types.Content(
+                role="user",
+                parts=[
+                    types.Part.from_bytes(data=window, mime_type="video/webm"),
+                    types.Part.from_text(text=LIVE_WINDOW_PROMPT)
+                ]
+            )
+        ],
+        config=types.GenerateContentConfig(
+            max_output_tokens=10,
+            temperature=0
+        )
+    )
+    result = (response.text or "").strip().upper()
+    live_events.debug("Live window analysis: %s", result)
+    return "YES" in result
 
 async def live_pain_detection(websocket: WebSocket):
     """
     Handles real-time audio/video streaming from client.
     Uses Gemini 2.0 Flash (or 1.5 Flash) to detect pain cues instantly.
+
+    Incoming webm chunks feed a SlidingWindowAnalyzer, which checks overlapping
+    windows (LIVE_WINDOW_CHUNKS long, every LIVE_WINDOW_STRIDE_CHUNKS) in the
+    background while the socket keeps being read.
     """
-    print("--- LIVE PAIN DETECTION STARTED ---")
-    
+    logger.info("Live pain detection started")
+
     # 1. Setup Client
     custom_key = os.environ.get("GEMINI_CUSTOM_KEY") or os.environ.get("VITE_GEMINI_API_KEY")
-    client = genai.Client(api_key=custom_key)
-    
-    buffer = b""
-    CHUNK_THRESHOLD = 3 # Analyze every 3 chunks (approx 3 seconds)
-    chunk_count = 0
+    client = await asyncio.to_thread(get_genai_client, custom_key)
 
-    try:
+    analyzer = SlidingWindowAnalyzer(lambda window: _check_window_for_pain(client, window))
+
+    async def receive_chunks():
         while True:
             # Receive Blob/ArrayBuffer from Frontend
-            data = await websocket.receive_bytes()
-            buffer += data
-            chunk_count += 1
-            
-            # Analyze every N chunks (to avoid rate limits and latency)
-            if chunk_count >= CHUNK_THRESHOLD:
-                # print(f"Analyzing Buffer: {len(buffer)} bytes")
-                
-                try:
-                    # Quick Check with Gemini 2.0 Flash
-                    response = client.models.generate_content(
-                        model='gemini-2.0-flash-exp', # Use 2.0 Flash Exp for best multimodal
-                        contents=[
-                            types.Content(
-                                role="user",
-                                parts=[
-                                    types.Part.from_bytes(data=buffer, mime_type="video/webm"),
-                                    types.Part.from_text(text="Is there any sign of physical PAIN (wincing, grimacing, moaning, screaming)? Answer purely YES or NO.")
-                                ]
-                            )
-                        ],
-                        config=types.GenerateContentConfig(
-                            max_output_tokens=10,
-                            temperature=0
-                        )
-                    )
-                    
-                    result = response.text.strip().upper()
-                    print(f"Live Analysis: {result}")
-                    
-                    if "YES" in result:
-                         await websocket.send_text("STOP")
-                         print(">>> SENT STOP SIGNAL <<<")
-                         break # Stop loop
-
-                except Exception as api_err:
-                    print(f"Live Flash Error: {api_err}")
-                
-                # Reset Buffer
-                buffer = b""
-                chunk_count = 0
+            analyzer.push(await websocket.receive_bytes())
 
+    receiver = asyncio.create_task(receive_chunks())
+    detector = asyncio.create_task(analyzer.detected.wait())
+    try:
+        done, _ = await asyncio.wait({receiver, detector}, return_when=asyncio.FIRST_COMPLETED)
+        if detector in done:
+            await websocket.send_text("STOP")
+            logger.warning("Pain detected, sent STOP signal")
+        else:
+            receiver.result() # Re-raises the disconnect
     except Exception as e:
-        print(f"Live Detection Connection Closed: {e}")
+        logger.info("Live detection connection closed: %s", e)
+    finally:
+        receiver.cancel()
+        detector.cancel()
+        await analyzer.aclose()
+        logger.info("Live window analysis finished", extra={"window_stats": analyzer.stats()})
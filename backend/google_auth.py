@@ -0,0 +1,91 @@
+import os
+import asyncio
+import hashlib
+import logging
+from typing import Optional, TYPE_CHECKING
+
+from .ttl_cache import TTLCache
+
+# httpx is imported with the first verification to keep app startup light
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIG ---
+# Override to point load tests at a local stub
+GOOGLE_USERINFO_URL = os.getenv("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v2/userinfo")
+GOOGLE_VERIFY_TIMEOUT_SECONDS = float(os.getenv("GOOGLE_VERIFY_TIMEOUT_SECONDS", "5"))
+GOOGLE_USERINFO_CACHE_TTL_SECONDS = float(os.getenv("GOOGLE_USERINFO_CACHE_TTL_SECONDS", "120"))
+GOOGLE_USERINFO_CACHE_MAX_ENTRIES = int(os.getenv("GOOGLE_USERINFO_CACHE_MAX_ENTRIES", "10000"))
+
+
+class GoogleUnavailable(Exception):
+    pass
+
+
+class GoogleTokenVerifier:
+    """
+    Resolves a Google access token to its userinfo on a pooled AsyncClient.
+
+    Verified userinfo is cached by token digest for a short TTL, and concurrent
+    verifications of the same token share one upstream call, so retries and
+    double submits from the frontend don't reach Google again.
+    """
+
+    def __init__(
+        self,
+        userinfo_url: str = GOOGLE_USERINFO_URL,
+        timeout: float = GOOGLE_VERIFY_TIMEOUT_SECONDS,
+        cache_ttl: float = GOOGLE_USERINFO_CACHE_TTL_SECONDS,
+        max_entries: int = GOOGLE_USERINFO_CACHE_MAX_ENTRIES,
+    ):
+        self.userinfo_url = userinfo_url
+        self.timeout = timeout
+        self.cache = TTLCache(maxsize=max_entries, ttl=cache_ttl)
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._inflight = {}
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        import httpx
+
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 2.0)),
+                limits=httpx.Limits(max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def verify(self, token: str) -> dict:
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        id_info = self.cache.get(digest)
+        if id_info is not None:
+            return id_info
+
+        pending = self._inflight.get(digest)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch(token))
+            self._inflight[digest] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(digest, None))
+        id_info = await asyncio.shield(pending)
+        self.cache.set(digest, id_info)
+        return id_info
+
+    async def _fetch(self, token: str) -> dict:
+        import httpx
+
+        try:
+            response = await self._get_client().get(self.userinfo_url, headers={"Authorization": f"Bearer {token}"})
+        except httpx.HTTPError as e:
+            logger.warning("Google token verification failed: %r", e)
+            raise GoogleUnavailable(str(e))
+
+        if response.status_code != 200:
+            logger.warning("Google token verification rejected (%s)", response.status_code)
+            raise ValueError(f"Google API Error: {response.text}")
+        return response.json()
@@ -0,0 +1,236 @@
+import os
+import json
+import uuid
+import mmap
+import shutil
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional, Callable, Awaitable
+from pydantic import BaseModel
+from sqlmodel import SQLModel, Field, Session, select
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIG ---
+ANALYSIS_JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "4"))
+ANALYSIS_JOB_QUEUE_SIZE = int(os.getenv("ANALYSIS_JOB_QUEUE_SIZE", "100"))
+ANALYSIS_JOB_DIR = os.getenv("ANALYSIS_JOB_DIR", "./analysis_jobs")
+
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_SUCCEEDED = "SUCCEEDED"
+JOB_FAILED = "FAILED"
+TERMINAL_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# --- DATABASE MODELS ---
+class AnalysisJob(SQLModel, table=True):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    activity_name: str
+    mime_type: str = "video/webm"
+    status: str = Field(default=JOB_QUEUED, index=True)
+    result_json: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+# Pydantic Schemas for API
+class AnalysisJobRead(BaseModel):
+    id: str
+    status: str
+    activity_name: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_job(cls, job: AnalysisJob) -> "AnalysisJobRead":
+        return cls(
+            id=job.id,
+            status=job.status,
+            activity_name=job.activity_name,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            result=json.loads(job.result_json) if job.result_json else None,
+            error=job.error,
+        )
+
+class JobQueueFull(Exception):
+    pass
+
+
+class AnalysisJobRunner:
+    """
+    Runs video analyses in the background on a bounded pool of asyncio workers.
+
+    Job rows live in the app database; the decoded video is written to
+    `job_dir` until the job finishes, so queued work survives a restart.
+    Workers read it back through mmap.
+    """
+
+    def __init__(
+        self,
+        engine,
+        analyze: Callable[..., Awaitable[dict]],
+        on_success: Optional[Callable[[int, str, dict], None]] = None,
+        workers: int = ANALYSIS_JOB_WORKERS,
+        max_queue: int = ANALYSIS_JOB_QUEUE_SIZE,
+        job_dir: str = ANALYSIS_JOB_DIR,
+    ):
+        self.engine = engine
+        self.analyze = analyze
+        self.on_success = on_success
+        self.workers = workers
+        self.max_queue = max_queue
+        self.job_dir = job_dir
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._events = {}
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        os.makedirs(self.job_dir, exist_ok=True)
+        for job_id in await asyncio.to_thread(self._recover):
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info("Analysis job runner started (%d workers, %d recovered)", self.workers, self._queue.qsize())
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _recover(self):
+        """Re-queues jobs interrupted by a restart; fails those whose payload is gone."""
+        recovered = []
+        with Session(self.engine) as session:
+            statement = select(AnalysisJob).where(AnalysisJob.status.in_([JOB_QUEUED, JOB_RUNNING])).order_by(AnalysisJob.created_at)
+            for job in session.exec(statement).all():
+                if os.path.exists(self._payload_path(job.id)):
+                    job.status = JOB_QUEUED
+                    job.started_at = None
+                    recovered.append(job.id)
+                else:
+                    job.status = JOB_FAILED
+                    job.error = "Payload lost during restart"
+                    job.finished_at = datetime.utcnow()
+                session.add(job)
+            session.commit()
+        return recovered
+
+    # --- Public API ---
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def submit(self, user_id: int, video_file, activity_name: str, mime_type: str) -> AnalysisJob:
+        if self.queue_depth >= self.max_queue:
+            raise JobQueueFull()
+
+        job = AnalysisJob(user_id=user_id, activity_name=activity_name, mime_type=mime_type)
+        await asyncio.to_thread(self._write_payload, job.id, video_file)
+        job = await asyncio.to_thread(self._insert, job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        with Session(self.engine) as session:
+            return session.get(AnalysisJob, job_id)
+
+    def subscribe(self, job_id: str) -> asyncio.Event:
+        """Returns an event that is set on the job's next status change."""
+        return self._events.setdefault(job_id, asyncio.Event())
+
+    def unsubscribe(self, job_id: str):
+        """Drops the job's event once it has finished; a finished job is never notified again."""
+        self._events.pop(job_id, None)
+
+    # --- Internals ---
+
+    def _payload_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.video")
+
+    def _write_payload(self, job_id: str, video_file):
+        video_file.seek(0)
+        with open(self._payload_path(job_id), "wb") as f:
+            shutil.copyfileobj(video_file, f)
+
+    def _delete_payload(self, job_id: str):
+        try:
+            os.remove(self._payload_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def _insert(self, job: AnalysisJob) -> AnalysisJob:
+        with Session(self.engine) as session:
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            return job
+
+    def _update(self, job_id: str, **fields) -> Optional[AnalysisJob]:
+        with Session(self.engine) as session:
+            job = session.get(AnalysisJob, job_id)
+            if job is None:
+                return None
+            for key, value in fields.items():
+                setattr(job, key, value)
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            return job
+
+    def _notify(self, job_id: str):
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.exception("Analysis job %s crashed: %s", job_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self._update, job_id, status=JOB_RUNNING, started_at=datetime.utcnow())
+        if job is None:
+            return
+        self._notify(job_id)
+
+        try:
+            with open(self._payload_path(job_id), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as video:
+                    result = await self.analyze(video, size, job.activity_name, job.mime_type)
+        except Exception as e:
+            logger.error("Analysis job %s failed: %s", job_id, e)
+            await asyncio.to_thread(self._update, job_id, status=JOB_FAILED, error=str(e), finished_at=datetime.utcnow())
+            await asyncio.to_thread(self._delete_payload, job_id)
+            self._notify(job_id)
+            return
+
+        await asyncio.to_thread(
+            self._update, job_id, status=JOB_SUCCEEDED, result_json=json.dumps(result), finished_at=datetime.utcnow()
+        )
+        await asyncio.to_thread(self._delete_payload, job_id)
+        self._notify(job_id)
+
+        if self.on_success:
+            # Called on the event loop; it must only queue work, not block
+            try:
+                self.on_success(job.user_id, job.activity_name, result)
+            except Exception as db_err:
+                logger.warning("Failed to save stats: %s", db_err)
@@ -0,0 +1,90 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+
+class JSONFieldStream:
+    """
+    Incremental parser for a top-level JSON object arriving in text chunks
+    (e.g. a model's streamed response). `feed` returns the (key, value) pairs
+    whose values became complete in that chunk, so early fields can be acted
+    on before the object is closed. Anything before the opening brace (a
+    Markdown fence, whitespace) is ignored; nested values are returned whole.
+
+    The scan is a single pass over new text with O(1) state per character.
+    It doesn't validate: a field that fails to decode is skipped, and the
+    caller's json.loads of the full text stays the authority.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._awaiting_value = False
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        completed = []
+        if self.done:
+            return completed
+        self._text += chunk
+        text = self._text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None and self._key is None:
+                        self._key = json.loads(text[self._key_start:i + 1])
+                continue
+
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                continue
+
+            if self._depth == 1 and self._awaiting_value and self._value_start is None and c not in _WHITESPACE:
+                self._value_start = i
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and not self._awaiting_value:
+                    self._key_start = i
+            elif c in "{[":
+                self._depth += 1
+            elif c == ":" and self._depth == 1:
+                self._awaiting_value = True
+            elif c == "," and self._depth == 1:
+                self._complete(i, completed)
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete(i, completed)
+                    self.done = True
+                    self._pos = i + 1
+                    return completed
+        self._pos = len(text)
+        return completed
+
+    def _complete(self, end: int, completed: list):
+        if self._key is not None and self._value_start is not None:
+            try:
+                value = json.loads(self._text[self._value_start:end])
+            except ValueError:
+                pass # Left to the final parse
+            else:
+                self.fields[self._key] = value
+                completed.append((self._key, value))
+        self._key_start = self._key = self._value_start = None
+        self._awaiting_value = False
@@ -0,0 +1,402 @@
+import io
+import os
+import json
+import time
+import base64
+import struct
+import asyncio
+from collections import deque
+from typing import Optional, NamedTuple, Union
+
+from .metrics import LIVE_FORWARDED, LIVE_DROPPED, UPSTREAM_PAYLOAD_BYTES, UPSTREAM_ERRORS
+
+# --- CONFIG ---
+# dHash bits (of 64) that must differ from the last forwarded frame for a frame to be sent upstream
+LIVE_FRAME_HASH_THRESHOLD = int(os.getenv("LIVE_FRAME_HASH_THRESHOLD", "6"))
+# A frame is forwarded at least this often even if nothing moved, so the model keeps seeing the patient
+LIVE_FRAME_KEEPALIVE_SECONDS = float(os.getenv("LIVE_FRAME_KEEPALIVE_SECONDS", "5"))
+
+# Audio gating (16 kHz 16-bit mono PCM, analysed in 20 ms sub-frames)
+LIVE_AUDIO_SAMPLE_RATE = 16000
+# Sub-frames louder than this count as voice / movement noise and are forwarded
+LIVE_VAD_THRESHOLD_DBFS = float(os.getenv("LIVE_VAD_THRESHOLD_DBFS", "-45"))
+# Audio keeps flowing this long after the last voiced sub-frame so word/groan tails aren't clipped
+LIVE_VAD_HANGOVER_MS = int(os.getenv("LIVE_VAD_HANGOVER_MS", "500"))
+# Sustained energy above this for LIVE_DISTRESS_MIN_MS raises a local ALERT (e.g. a scream)
+LIVE_DISTRESS_THRESHOLD_DBFS = float(os.getenv("LIVE_DISTRESS_THRESHOLD_DBFS", "-8"))
+LIVE_DISTRESS_MIN_MS = int(os.getenv("LIVE_DISTRESS_MIN_MS", "300"))
+LIVE_DISTRESS_COOLDOWN_SECONDS = float(os.getenv("LIVE_DISTRESS_COOLDOWN_SECONDS", "5"))
+_VAD_FRAME_SAMPLES = LIVE_AUDIO_SAMPLE_RATE // 50
+
+# Per-session send queue bounds. Video keeps only the freshest frames; audio is
+# sent first and only dropped (oldest first) if upstream stalls for this many chunks
+LIVE_VIDEO_QUEUE_SIZE = int(os.getenv("LIVE_VIDEO_QUEUE_SIZE", "2"))
+LIVE_AUDIO_QUEUE_SIZE = int(os.getenv("LIVE_AUDIO_QUEUE_SIZE", "32"))
+# Video frames older than this (since capture) are dropped instead of sent; audio is never dropped for age
+LIVE_VIDEO_MAX_AGE_MS = float(os.getenv("LIVE_VIDEO_MAX_AGE_MS", "2000"))
+
+# Offered by clients that send binary media frames instead of JSON + base64 text
+LIVE_BINARY_SUBPROTOCOL = "physiovibe.media.v1"
+
+# Binary frame: 1-byte type tag, uint64 capture timestamp (ms since epoch, little-endian), raw payload
+MEDIA_AUDIO = 0x01 # 16 kHz 16-bit PCM
+MEDIA_VIDEO = 0x02 # JPEG
+MEDIA_MIME_TYPES = {MEDIA_AUDIO: "audio/pcm", MEDIA_VIDEO: "image/jpeg"}
+MEDIA_KIND_NAMES = {MEDIA_AUDIO: "audio", MEDIA_VIDEO: "video"}
+_FRAME_HEADER = struct.Struct("<BQ")
+
+# Process-wide totals across sessions (reported on /health)
+frame_totals = {"forwarded": 0, "dropped": 0}
+_active_queues = set()
+
+
+def frame_dhash(jpeg: bytes) -> Optional[int]:
+    """
+    64-bit difference hash of a JPEG frame, or None if it can't be decoded.
+    Bits compare horizontally adjacent pixels of a 9x8 grayscale thumbnail, so
+    small lighting changes and JPEG noise leave the hash (nearly) unchanged.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(jpeg)) as img:
+            # Let libjpeg decode at 1/8 scale via DCT scaling instead of decoding full size
+            img.draft("L", (36, 32))
+            pixels = img.convert("L").resize((9, 8), Image.BILINEAR).tobytes()
+    except Exception:
+        return None
+
+    bits = 0
+    for row in range(0, 72, 9):
+        for col in range(row, row + 8):
+            bits = (bits << 1) | (pixels[col] > pixels[col + 1])
+    return bits
+
+
+class FrameGate:
+    """
+    Per-session filter for live video frames. A frame is forwarded when its
+    dHash moved more than `threshold` bits away from the last forwarded frame,
+    or when `keepalive` seconds have passed since the last one was sent.
+    """
+
+    def __init__(self, threshold: int = LIVE_FRAME_HASH_THRESHOLD, keepalive: float = LIVE_FRAME_KEEPALIVE_SECONDS):
+        self.threshold = threshold
+        self.keepalive = keepalive
+        self.forwarded = 0
+        self.dropped = 0
+        self._last_hash: Optional[int] = None
+        self._last_forwarded_at = 0.0
+
+    def should_forward(self, jpeg: bytes, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        frame_hash = frame_dhash(jpeg)
+        changed = (
+            frame_hash is None # Undecodable: let the model decide
+            or self._last_hash is None
+            or bin(frame_hash ^ self._last_hash).count("1") > self.threshold
+        )
+        if changed or now - self._last_forwarded_at >= self.keepalive:
+            self._last_hash = frame_hash
+            self._last_forwarded_at = now
+            self.forwarded += 1
+            frame_totals["forwarded"] += 1
+            return True
+        self.dropped += 1
+        frame_totals["dropped"] += 1
+        LIVE_DROPPED.inc("video", "duplicate")
+        return False
+
+    def stats(self) -> dict:
+        total = self.forwarded + self.dropped
+        return {
+            "forwarded": self.forwarded,
+            "dropped": self.dropped,
+            "drop_ratio": round(self.dropped / total, 3) if total else 0.0,
+        }
+
+
+class AudioGate:
+    """
+    Per-session energy gate for live PCM audio. Each chunk is split into 20 ms
+    sub-frames and their RMS level (dBFS) is computed in one vectorized pass.
+
+    `process` returns (forward, alert): silence is not forwarded once the
+    hangover after the last voiced sub-frame runs out, and `alert` is True when
+    loud audio has been sustained for `distress_ms` (at most once per cooldown),
+    so the handler can alert without a model round trip.
+    """
+
+    def __init__(
+        self,
+        vad_dbfs: float = LIVE_VAD_THRESHOLD_DBFS,
+        hangover_ms: int = LIVE_VAD_HANGOVER_MS,
+        distress_dbfs: float = LIVE_DISTRESS_THRESHOLD_DBFS,
+        distress_ms: int = LIVE_DISTRESS_MIN_MS,
+        cooldown: float = LIVE_DISTRESS_COOLDOWN_SECONDS,
+    ):
+        self.vad_dbfs = vad_dbfs
+        self.hangover_samples = hangover_ms * LIVE_AUDIO_SAMPLE_RATE // 1000
+        self.distress_dbfs = distress_dbfs
+        self.distress_samples = distress_ms * LIVE_AUDIO_SAMPLE_RATE // 1000
+        self.cooldown = cooldown
+        self.forwarded = 0
+        self.dropped = 0
+        self.alerts = 0
+        self._hangover_left = 0
+        self._loud_run = 0
+        self._last_alert_at = float("-inf")
+
+    @staticmethod
+    def levels_dbfs(pcm: bytes):
+        """RMS level of each 20 ms sub-frame (a trailing partial sub-frame counts as one)."""
+        import numpy as np
+
+        samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2).astype(np.float32)
+        if samples.size == 0:
+            return np.empty(0, dtype=np.float32)
+        whole = samples.size - samples.size % _VAD_FRAME_SAMPLES
+        frames = [samples[:whole].reshape(-1, _VAD_FRAME_SAMPLES)] if whole else []
+        power = [np.mean(np.square(f), axis=1) for f in frames]
+        if whole < samples.size:
+            power.append(np.mean(np.square(samples[whole:]), keepdims=True))
+        rms = np.sqrt(np.concatenate(power))
+        return 20 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+
+    def process(self, pcm: bytes, now: Optional[float] = None):
+        levels = self.levels_dbfs(pcm)
+        n = len(levels)
+        if n == 0:
+            return False, False
+        frame_samples = len(pcm) // 2 / n
+
+        voiced = levels > self.vad_dbfs
+        if voiced.any():
+            # Hangover restarts from the last voiced sub-frame in the chunk
+            trailing = n - 1 - int(voiced.nonzero()[0][-1])
+            self._hangover_left = max(self.hangover_samples - int(trailing * frame_samples), 0)
+            forward = True
+        else:
+            forward = self._hangover_left > 0
+            self._hangover_left = max(self._hangover_left - int(n * frame_samples), 0)
+
+        # Longest loud run, carried across chunk boundaries
+        alert = False
+        for loud in levels > self.distress_dbfs:
+            self._loud_run = self._loud_run + frame_samples if loud else 0
+            if self._loud_run >= self.distress_samples:
+                now = time.monotonic() if now is None else now
+                if now - self._last_alert_at >= self.cooldown:
+                    self._last_alert_at = now
+                    self.alerts += 1
+                    alert = True
+                self._loud_run = 0
+
+        if forward:
+            self.forwarded += 1
+        else:
+            self.dropped += 1
+            LIVE_DROPPED.inc("audio", "silence")
+        return forward, alert
+
+    def stats(self) -> dict:
+        return {"forwarded": self.forwarded, "dropped": self.dropped, "distress_alerts": self.alerts}
+
+
+# --- WIRE PROTOCOL ---
+
+class MediaFrame(NamedTuple):
+    kind: int
+    timestamp_ms: float
+    data: Union[bytes, memoryview] # A view into the socket message for binary frames
+
+
+async def accept_live_socket(websocket) -> bool:
+    """Accepts the WebSocket, agreeing on binary framing if the client offered it. Returns True for binary."""
+    binary = LIVE_BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=LIVE_BINARY_SUBPROTOCOL if binary else None)
+    return binary
+
+def encode_binary_frame(kind: int, data: bytes, timestamp_ms: Optional[float] = None) -> bytes:
+    if timestamp_ms is None:
+        timestamp_ms = time.time() * 1000
+    return _FRAME_HEADER.pack(kind, int(timestamp_ms)) + data
+
+def decode_binary_frame(message: bytes) -> Optional[MediaFrame]:
+    if len(message) <= _FRAME_HEADER.size:
+        return None
+    kind, timestamp_ms = _FRAME_HEADER.unpack_from(message)
+    if kind not in MEDIA_MIME_TYPES:
+        return None
+    # A view, not a slice: gating reads it in place and frames that are dropped are never copied
+    return MediaFrame(kind, timestamp_ms, memoryview(message)[_FRAME_HEADER.size:])
+
+def decode_json_frame(message: str) -> Optional[MediaFrame]:
+    """
+    Legacy text frames: {"audio": b64} / {"image": b64} from useLiveSafetyMonitor,
+    or {"type": "audio" | "video", "data": b64}. These carry no capture time,
+    so the receive time stands in for it.
+    """
+    payload = json.loads(message)
+    if "audio" in payload:
+        kind, data = MEDIA_AUDIO, payload["audio"]
+    elif "image" in payload:
+        kind, data = MEDIA_VIDEO, payload["image"]
+    elif payload.get("type") == "audio":
+        kind, data = MEDIA_AUDIO, payload.get("data")
+    elif payload.get("type") == "video":
+        kind, data = MEDIA_VIDEO, payload.get("data")
+    else:
+        return None
+    if not data:
+        return None
+    return MediaFrame(kind, time.time() * 1000, base64.b64decode(data))
+
+async def receive_media(websocket, binary: bool) -> Optional[MediaFrame]:
+    """Reads the next client message. None for messages that aren't media (callers skip them)."""
+    if binary:
+        return decode_binary_frame(await websocket.receive_bytes())
+    return decode_json_frame(await websocket.receive_text())
+
+
+# --- SEND QUEUE ---
+
+class LiveMediaQueue:
+    """
+    Decouples reading the client socket from sending to the live session.
+    `put` never blocks: a full video lane drops its oldest frame, so a slow
+    upstream gets the newest picture instead of a backlog. Audio has its own
+    lane and is always dequeued before video.
+
+    Frame age is measured from the capture timestamp, so a frame that sat in
+    socket buffers counts as stale even if it was queued just now. Client and
+    server clocks differ, so ages are relative to the smallest capture-to-receive
+    gap seen on this session (the freshest frame counts as age 0). JSON frames
+    carry the receive time instead, which makes their age the time spent queued.
+    """
+
+    def __init__(self, video_size: int = LIVE_VIDEO_QUEUE_SIZE, audio_size: int = LIVE_AUDIO_QUEUE_SIZE, max_video_age_ms: float = LIVE_VIDEO_MAX_AGE_MS):
+        self._lanes = {MEDIA_AUDIO: deque(), MEDIA_VIDEO: deque()}
+        self._limits = {MEDIA_AUDIO: audio_size, MEDIA_VIDEO: video_size}
+        self.max_video_age_ms = max_video_age_ms
+        # Smallest (receive wall time - capture timestamp) seen: network delay plus clock skew
+        self._clock_offset_ms: Optional[float] = None
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = {MEDIA_AUDIO: 0, MEDIA_VIDEO: 0}
+        self.dropped_stale = 0
+        self.sent = 0
+        self.max_depth = 0
+        self.max_age_ms = 0.0
+        self._age_total_ms = 0.0
+        self.opened_at = time.monotonic()
+        # Set by forward_media once the first frame has gone upstream
+        self.first_forward_ms: Optional[float] = None
+        _active_queues.add(self)
+
+    @property
+    def depth(self) -> int:
+        return len(self._lanes[MEDIA_AUDIO]) + len(self._lanes[MEDIA_VIDEO])
+
+    def _age_ms(self, frame: MediaFrame, now_ms: float) -> float:
+        return max(0.0, now_ms - frame.timestamp_ms - self._clock_offset_ms)
+
+    def put(self, frame: MediaFrame):
+        if self.closed:
+            return
+        offset = time.time() * 1000 - frame.timestamp_ms
+        if self._clock_offset_ms is None or offset < self._clock_offset_ms:
+            self._clock_offset_ms = offset
+        lane = self._lanes[frame.kind]
+        if len(lane) >= self._limits[frame.kind]:
+            lane.popleft()
+            self.dropped[frame.kind] += 1
+            LIVE_DROPPED.inc(MEDIA_KIND_NAMES[frame.kind], "queue_full")
+        lane.append(frame)
+        self.max_depth = max(self.max_depth, self.depth)
+        self._ready.set()
+
+    async def get(self) -> Optional[MediaFrame]:
+        """Next frame to send (audio first), or None once the queue is closed and drained."""
+        while True:
+            while not self.depth:
+                if self.closed:
+                    return None
+                self._ready.clear()
+                await self._ready.wait()
+            now_ms = time.time() * 1000
+            if self._lanes[MEDIA_AUDIO]:
+                frame = self._lanes[MEDIA_AUDIO].popleft()
+                age_ms = self._age_ms(frame, now_ms)
+                break
+            frame = self._lanes[MEDIA_VIDEO].popleft()
+            # How stale the picture is when it would go upstream, counting time before it reached us
+            age_ms = self._age_ms(frame, now_ms)
+            if age_ms <= self.max_video_age_ms:
+                break
+            self.dropped[MEDIA_VIDEO] += 1
+            self.dropped_stale += 1
+            LIVE_DROPPED.inc("video", "stale")
+        self.sent += 1
+        self._age_total_ms += age_ms
+        self.max_age_ms = max(self.max_age_ms, age_ms)
+        return frame
+
+    def close(self):
+        """Stops accepting frames and wakes the sender so it can exit once drained."""
+        self.closed = True
+        self._ready.set()
+        _active_queues.discard(self)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped_audio": self.dropped[MEDIA_AUDIO],
+            "dropped_video": self.dropped[MEDIA_VIDEO],
+            "dropped_stale": self.dropped_stale,
+            "avg_age_ms": round(self._age_total_ms / self.sent, 1) if self.sent else 0.0,
+            "max_age_ms": round(self.max_age_ms, 1),
+            "first_forward_ms": round(self.first_forward_ms, 1) if self.first_forward_ms is not None else None,
+        }
+
+
+async def forward_media(queue: LiveMediaQueue, session):
+    """Sender task: drains `queue` into the live session until the queue is closed."""
+    while True:
+        frame = await queue.get()
+        if frame is None:
+            return
+        try:
+            # The SDK wants bytes; this is the only copy of the payload between the socket and upstream
+            await session.send(input={"mime_type": MEDIA_MIME_TYPES[frame.kind], "data": bytes(frame.data)}, end_of_turn=False)
+        except Exception as e:
+            UPSTREAM_ERRORS.inc("live", type(e).__name__)
+            raise
+        LIVE_FORWARDED.inc(MEDIA_KIND_NAMES[frame.kind])
+        UPSTREAM_PAYLOAD_BYTES.inc("live", amount=len(frame.data))
+        if queue.first_forward_ms is None:
+            queue.first_forward_ms = (time.monotonic() - queue.opened_at) * 1000
+
+async def run_session_loops(*loops):
+    """
+    Runs a live session's loops together until the first one exits (client hung up,
+    upstream closed, alert sent), then cancels the rest. A plain gather would keep the
+    upstream receive loop, and with it the Gemini session, alive after a disconnect.
+    """
+    tasks = [asyncio.create_task(loop) for loop in loops]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in done:
+        task.result() # Re-raises a loop's unexpected error
+
+def live_queue_totals() -> dict:
+    return {
+        "sessions": len(_active_queues),
+        "queue_depth": sum(queue.depth for queue in _active_queues),
+    }
@@ -1,10 +1,11 @@
-import asyncio
-import json
 import base64
-import traceback
+import logging
+from typing import Callable, Awaitable, AsyncContextManager
 from fastapi import WebSocket, WebSocketDisconnect
-from google import genai
-from google.genai import types
+
+from .live_media import LiveMediaQueue, receive_media, forward_media, run_session_loops, encode_binary_frame, MEDIA_AUDIO
+
+logger = logging.getLogger(__name__)
 
 # --- CONFIG ---
 PROJECT_ID = "ai-agent-477309"
@@ -12,49 +13,65 @@ LOCATION = "us-central1"
 # Utilizing the Native Audio model
 MODEL_ID = "gemini-live-2.5-flash-preview-native-audio-09-2025"
 
-async def manage_live_safety_session(websocket: WebSocket):
-    print("--- NEW CONNECTION ATTEMPT ---")
-    # await websocket.accept() # Handled in main.py
+async def connect_vertex_session():
+    """Returns the (unentered) Vertex live connection with the pain-alert tool configured."""
+    # Imported per session rather than at module load (the SDK is slow to import)
+    from google import genai
+    from google.genai import types
 
-    try:
-        client = genai.Client(
-            vertexai=True,
-            project=PROJECT_ID,
-            location=LOCATION,
-            http_options={"api_version": "v1"}
-        )
+    client = genai.Client(
+        vertexai=True,
+        project=PROJECT_ID,
+        location=LOCATION,
+        http_options={"api_version": "v1"}
+    )
 
-        # 1. Define Tool (Correctly Typed)
-        pain_tool = types.Tool(
-            function_declarations=[
-                types.FunctionDeclaration(
-                    name="trigger_pain_alert",
-                    description="Call this immediately when the user exhibits signs of pain, screaming, or grimacing.",
-                    parameters=types.Schema(
-                        type=types.Type.OBJECT,
-                        properties={
-                            "severity": types.Schema(type=types.Type.STRING, description="Severity (e.g. High, Medium)"),
-                        },
-                        required=["severity"]
-                    )
+    # 1. Define Tool (Correctly Typed)
+    pain_tool = types.Tool(
+        function_declarations=[
+            types.FunctionDeclaration(
+                name="trigger_pain_alert",
+                description="Call this immediately when the user exhibits signs of pain, screaming, or grimacing.",
+                parameters=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "severity": types.Schema(type=types.Type.STRING, description="Severity (e.g. High, Medium)"),
+                    },
+                    required=["severity"]
                 )
-            ]
-        )
+            )
+        ]
+    )
+
+    # 2. Config 
+    config = {
+        "tools": [pain_tool], 
+        "response_modalities": ["AUDIO"], 
+        "safety_settings": [
+            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+        ]
+    }
+    return client.aio.live.connect(model=MODEL_ID, config=config)
 
-        # 2. Config 
-        config = {
-            "tools": [pain_tool], 
-            "response_modalities": ["AUDIO"], 
-            "safety_settings": [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            ]
-        }
+async def manage_live_safety_session(
+    websocket: WebSocket,
+    binary: bool = False,
+    connect: Callable[[], Awaitable[AsyncContextManager]] = connect_vertex_session,
+):
+    """
+    `binary` is the framing agreed by live_media.accept_live_socket when the caller accepted the socket.
+    `connect` opens the upstream live session (swapped for a local fake by the load-test harness).
+    """
+    logger.info("Live safety session connecting")
+    # await websocket.accept() # Handled in main.py
 
-        async with client.aio.live.connect(model=MODEL_ID, config=config) as session:
-            print("✅ Gemini Session Established")
+    media_queue = LiveMediaQueue()
+    try:
+        async with await connect() as session:
+            logger.info("Gemini session established")
             
             # Send initial prompt
             await session.send(input="Monitor for pain. If detected, call trigger_pain_alert.", end_of_turn=True)
@@ -62,16 +79,22 @@ async def manage_live_safety_session(websocket: WebSocket):
             async def receive_from_client():
                 try:
                     while True:
-                        data = await websocket.receive_text()
-                        message = json.loads(data)
-                        if message["type"] == "audio":
-                            await session.send(input={"mime_type": "audio/pcm", "data": base64.b64decode(message["data"])}, end_of_turn=False)
-                        elif message["type"] == "video":
-                            await session.send(input={"mime_type": "image/jpeg", "data": base64.b64decode(message["data"])}, end_of_turn=False)
+                        frame = await receive_media(websocket, binary)
+                        if frame is None:
+                            continue
+                        media_queue.put(frame)
                 except WebSocketDisconnect:
-                    print("Client disconnected")
+                    logger.info("Client disconnected")
+                except Exception as e:
+                    logger.error("Client loop error: %s", e)
+                finally:
+                    media_queue.close()
+
+            async def send_to_gemini():
+                try:
+                    await forward_media(media_queue, session)
                 except Exception as e:
-                    print(f"Client Loop Error: {e}")
+                    logger.error("Send loop error: %s", e)
 
             async def receive_from_gemini():
                 try:
@@ -83,21 +106,26 @@ async def manage_live_safety_session(websocket: WebSocket):
 
                             for part in model_turn.parts:
                                 if part.function_call:
-                                    print(f"!!! TOOL CALLED: {part.function_call.name} !!!")
+                                    logger.warning("Tool called: %s", part.function_call.name)
                                     await websocket.send_json({"status": "STOP", "reason": "Pain Detected"})
                                     return
                                 
                                 if part.inline_data:
                                     # Audio response
+                                    if binary:
+                                        await websocket.send_bytes(encode_binary_frame(MEDIA_AUDIO, part.inline_data.data))
+                                        continue
                                     b64 = base64.b64encode(part.inline_data.data).decode("utf-8")
                                     await websocket.send_json({"type": "audio", "data": b64})
                 except Exception as e:
-                    print(f"Gemini Loop Error: {e}")
+                    logger.error("Gemini loop error: %s", e)
 
-            # Run both loops
-            await asyncio.gather(receive_from_client(), receive_from_gemini())
+            # Run all loops; the session ends when any of them does
+            await run_session_loops(receive_from_client(), send_to_gemini(), receive_from_gemini())
 
-    except Exception as e:
-        print("❌ CRITICAL SERVER ERROR:")
-        traceback.print_exc() # <--- THIS WILL SHOW YOU WHY IT CRASHES
+    except Exception:
+        logger.exception("Live safety session crashed")
         await websocket.close(code=1011)
+    finally:
+        media_queue.close()
+        logger.info("Live session finished", extra={"queue": media_queue.stats()})
@@ -0,0 +1,159 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Callable, Awaitable, AsyncContextManager
+
+from .metrics import LIVE_FIRST_FORWARD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIG ---
+# Pre-connected live sessions kept ready for new WebSockets (0 connects on demand only)
+LIVE_POOL_SIZE = int(os.getenv("LIVE_POOL_SIZE", "2"))
+# Idle sessions older than this are closed and replaced (keep well under the upstream session limit)
+LIVE_POOL_TTL_SECONDS = float(os.getenv("LIVE_POOL_TTL_SECONDS", "300"))
+# Back-off after a failed background connect
+LIVE_POOL_RETRY_SECONDS = float(os.getenv("LIVE_POOL_RETRY_SECONDS", "5"))
+
+
+class LiveSessionPool:
+    """
+    Keeps up to `size` live sessions connected and configured ahead of time, so
+    a new WebSocket can start forwarding media without waiting on the handshake.
+
+    `connect` returns an (unentered) async context manager such as
+    `client.aio.live.connect(...)`; the pool enters it in the background and
+    the claiming handler's `async with pool.session()` exits it. Sessions are
+    single-use: a claimed session is closed with its WebSocket, never returned.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[AsyncContextManager]],
+        size: int = LIVE_POOL_SIZE,
+        ttl: float = LIVE_POOL_TTL_SECONDS,
+        retry_delay: float = LIVE_POOL_RETRY_SECONDS,
+    ):
+        self.connect = connect
+        self.size = size
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self._idle = deque() # (connected_at, context manager, session), oldest first
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = set() # Closes of expired sessions, held so they aren't garbage-collected mid-await
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.failures = 0
+        self._connects = 0
+        self._connect_total_ms = 0.0
+        self._first_forwards = 0
+        self._first_forward_total_ms = 0.0
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        if self.size > 0:
+            self._task = asyncio.create_task(self._refill())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._idle:
+            _, context, _ = self._idle.popleft()
+            await self._close(context)
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+    # --- Claiming ---
+
+    @asynccontextmanager
+    async def session(self):
+        context, session = await self._claim()
+        try:
+            yield session
+        finally:
+            await self._close(context)
+
+    async def _claim(self):
+        now = time.monotonic()
+        self._expire(now)
+        if self._idle:
+            # Newest first: it has the most lifetime left before the upstream cuts it off
+            _, context, session = self._idle.pop()
+            self.hits += 1
+            self._wakeup.set()
+            return context, session
+        self.misses += 1
+        self._wakeup.set()
+        return await self._open()
+
+    def record_first_forward(self, elapsed_ms: float):
+        """Time from WebSocket accept to the first frame sent upstream, reported by the handler."""
+        self._first_forwards += 1
+        self._first_forward_total_ms += elapsed_ms
+        LIVE_FIRST_FORWARD_SECONDS.observe(elapsed_ms / 1000)
+
+    # --- Internals ---
+
+    async def _open(self):
+        start = time.monotonic()
+        context = await self.connect()
+        session = await context.__aenter__()
+        self._connects += 1
+        self._connect_total_ms += (time.monotonic() - start) * 1000
+        return context, session
+
+    async def _close(self, context):
+        try:
+            await context.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning("Error closing live session: %s", e)
+
+    def _expire(self, now: float):
+        while self._idle and now - self._idle[0][0] >= self.ttl:
+            _, context, _ = self._idle.popleft()
+            self.expired += 1
+            task = asyncio.create_task(self._close(context))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def _refill(self):
+        while True:
+            self._expire(time.monotonic())
+            if len(self._idle) < self.size:
+                try:
+                    context, session = await self._open()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failures += 1
+                    logger.warning("Live session pool connect failed: %s", e)
+                    await asyncio.sleep(self.retry_delay)
+                    continue
+                self._idle.append((time.monotonic(), context, session))
+                continue
+
+            # Full: sleep until a claim or the oldest session is due to expire
+            self._wakeup.clear()
+            timeout = self.ttl - (time.monotonic() - self._idle[0][0]) if self._idle else self.ttl
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(timeout, 0.1))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "idle": len(self._idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "connect_failures": self.failures,
+            "avg_connect_ms": round(self._connect_total_ms / self._connects, 1) if self._connects else 0.0,
+            "avg_first_forward_ms": round(self._first_forward_total_ms / self._first_forwards, 1) if self._first_forwards else 0.0,
+        }
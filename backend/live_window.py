@@ -0,0 +1,161 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Awaitable, Optional
+
+from .metrics import UPSTREAM_ERRORS, UPSTREAM_PAYLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIG ---
+# Window length and hop, in client chunks (MediaRecorder emits roughly one per second)
+LIVE_WINDOW_CHUNKS = int(os.getenv("LIVE_WINDOW_CHUNKS", "3"))
+LIVE_WINDOW_STRIDE_CHUNKS = int(os.getenv("LIVE_WINDOW_STRIDE_CHUNKS", "1"))
+# Model checks running at once per session; starting one more cancels the oldest
+LIVE_WINDOW_MAX_IN_FLIGHT = int(os.getenv("LIVE_WINDOW_MAX_IN_FLIGHT", "2"))
+# Preallocated per-session buffer; windows larger than this lose their oldest chunks
+LIVE_WINDOW_BUFFER_BYTES = int(os.getenv("LIVE_WINDOW_BUFFER_BYTES", str(16 * 1024 * 1024)))
+
+
+class ChunkRing:
+    """
+    Fixed-size byte ring holding the most recent `max_chunks` chunks. Appends
+    write into the preallocated buffer in place; only `snapshot` copies.
+    """
+
+    def __init__(self, capacity: int, max_chunks: int):
+        self.capacity = capacity
+        self.max_chunks = max_chunks
+        self._view = memoryview(bytearray(capacity))
+        self._chunks = deque() # (start, length), oldest first and contiguous in the ring
+        self._write = 0
+        self._used = 0
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def append(self, data: bytes) -> bool:
+        """Adds a chunk, evicting the oldest ones to make room. False if the chunk alone doesn't fit."""
+        size = len(data)
+        if size > self.capacity:
+            return False
+        while self._chunks and (self._used + size > self.capacity or len(self._chunks) >= self.max_chunks):
+            _, length = self._chunks.popleft()
+            self._used -= length
+
+        data = memoryview(data)
+        start = self._write
+        head = min(size, self.capacity - start)
+        self._view[start:start + head] = data[:head]
+        if head < size:
+            self._view[:size - head] = data[head:]
+        self._write = (start + size) % self.capacity
+        self._chunks.append((start, size))
+        self._used += size
+        return True
+
+    def snapshot(self) -> bytes:
+        if not self._chunks:
+            return b""
+        start = self._chunks[0][0]
+        end = start + self._used
+        if end <= self.capacity:
+            return bytes(self._view[start:end])
+        return b"".join((self._view[start:], self._view[:end - self.capacity]))
+
+
+class SlidingWindowAnalyzer:
+    """
+    Runs `check(window)` over overlapping windows of a chunked media stream:
+    every `stride` chunks, the last `window` chunks are snapshotted and checked
+    in the background. At most `max_in_flight` checks run at once; a newer
+    window cancels the oldest running check rather than queueing behind it.
+
+    `detected` is set as soon as any check returns True. Container streams
+    (MediaRecorder webm) only carry their header in the first chunk, so with
+    `keep_header` that chunk is prepended to every window that lost it.
+    """
+
+    def __init__(
+        self,
+        check: Callable[[bytes], Awaitable[bool]],
+        window: int = LIVE_WINDOW_CHUNKS,
+        stride: int = LIVE_WINDOW_STRIDE_CHUNKS,
+        max_in_flight: int = LIVE_WINDOW_MAX_IN_FLIGHT,
+        capacity: int = LIVE_WINDOW_BUFFER_BYTES,
+        keep_header: bool = True,
+    ):
+        self.check = check
+        self.window = window
+        self.stride = stride
+        self.max_in_flight = max_in_flight
+        self.keep_header = keep_header
+        self.detected = asyncio.Event()
+        self._ring = ChunkRing(capacity, window)
+        self._header: Optional[bytes] = None
+        self._chunks_seen = 0
+        self._in_flight = deque() # oldest first
+        self.windows = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def push(self, chunk: bytes):
+        """Adds a client chunk and starts a check when a stride boundary is reached. Never blocks."""
+        if self.detected.is_set():
+            return
+        if self._header is None and self.keep_header:
+            self._header = bytes(chunk)
+        if not self._ring.append(chunk):
+            logger.warning("Live chunk of %d bytes exceeds the window buffer, skipped", len(chunk))
+            return
+        self._chunks_seen += 1
+        if self._chunks_seen < self.window or (self._chunks_seen - self.window) % self.stride:
+            return
+
+        window = self._ring.snapshot()
+        if self._header is not None and self._chunks_seen > self.window:
+            window = self._header + window
+
+        while len(self._in_flight) >= self.max_in_flight:
+            # The newer window covers the most recent movement; the oldest check is stale
+            self._in_flight.popleft().cancel()
+            self.cancelled += 1
+        task = asyncio.create_task(self._run(window))
+        self._in_flight.append(task)
+        task.add_done_callback(self._discard)
+        self.windows += 1
+
+    def _discard(self, task: asyncio.Task):
+        try:
+            self._in_flight.remove(task)
+        except ValueError:
+            pass # Already removed when it was cancelled
+
+    async def _run(self, window: bytes):
+        try:
+            UPSTREAM_PAYLOAD_BYTES.inc("live_window", amount=len(window))
+            if await self.check(window):
+                self.detected.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            UPSTREAM_ERRORS.inc("live_window", type(e).__name__)
+            logger.error("Live window check failed: %s", e)
+
+    async def aclose(self):
+        """Cancels outstanding checks (e.g. on disconnect or once pain was detected)."""
+        tasks = list(self._in_flight)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "chunks": self._chunks_seen,
+            "windows": self.windows,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "in_flight": len(self._in_flight),
+        }
@@ -1,30 +1,59 @@
 
-from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlmodel import SQLModel, Field, Session, create_engine, select
+from sqlmodel import SQLModel, Field, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import Index, case, delete, update, func, inspect, text
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from pydantic import BaseModel
-from typing import Optional
-from datetime import datetime, timedelta
-from passlib.context import CryptContext
+from typing import Optional, List, Literal
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
 import jwt
 import os
 import secrets
-import traceback
-import base64
 import asyncio
 import json
-from google.oauth2 import id_token
-from google.auth.transport import requests
-import requests as http_requests
-from google import genai
-from google.genai import types
-from .gemini_service import analyze_video
+import time
+import hashlib
+import logging
+from dotenv import load_dotenv
+
+# Load before the modules below read their module-level config
+load_dotenv(dotenv_path=".env.local")
+
+from .app_logging import configure_logging, shutdown_logging, get_event_logger
+configure_logging()
+logger = logging.getLogger(__name__)
+live_events = get_event_logger(__name__)
+
+from .gemini_service import analyze_video_file_async, close_clients, preload_sdk, get_genai_client, FieldCallback
+from .analysis_cache import AnalysisCache, build_file_cache_key
+from .video_spool import VideoSpool, SpoolBudget, VideoTooLarge, SpoolBudgetExceeded, base64_decoded_size, VIDEO_MAX_BYTES
+from .database import create_db_engine, create_async_db_engine, create_async_session_factory
+from .ttl_cache import TTLCache
+from .password_hashing import PasswordHasher, HashingBusy
+from .google_auth import GoogleTokenVerifier, GoogleUnavailable
+from .write_behind import WriteBehindBatcher
+from .jobs import AnalysisJobRunner, AnalysisJobRead, JobQueueFull, TERMINAL_STATUSES
+from .live_pool import LiveSessionPool
+from .metrics import Gauge, HTTPMetricsMiddleware, ANALYZE_STAGE_SECONDS, render_metrics
+from .live_media import FrameGate, AudioGate, LiveMediaQueue, frame_totals, live_queue_totals, accept_live_socket, receive_media, forward_media, run_session_loops, MEDIA_AUDIO, MEDIA_VIDEO
 
 # --- CONFIGURATION ---
 SECRET_KEY = os.getenv("SECRET_KEY", "SUPER_SECRET_KEY_CHANGE_ME_IN_PROD") 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Resolved users / decoded tokens are reused for this long (explicitly invalidated on writes)
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# Import the Gemini SDK in the background after startup instead of on the first analysis
+PRELOAD_GENAI_SDK = os.getenv("PRELOAD_GENAI_SDK", "true").lower() in ("1", "true", "yes")
 SQLITE_FILE_NAME = "physiovibe.db"
 # Use env var for DB (Postgres in prod), fallback to local SQLite
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///./{SQLITE_FILE_NAME}")
@@ -41,7 +70,7 @@ class User(SQLModel, table=True):
     email: str = Field(index=True, unique=True)
     hashed_password: str
     full_name: str
-    role: str = "PATIENT" # 'PATIENT' or 'CLINICIAN'
+    role: str = "PATIENT" # 'PATIENT' or 'CLINICIAN' (clinicians are promoted by an operator, never at signup)
     phone: Optional[str] = None
     dob: Optional[str] = None
     gender: Optional[str] = None
@@ -55,22 +84,65 @@ class Appointment(SQLModel, table=True):
     date_str: str # e.g. "Oct 28"
     time_str: str # e.g. "11:00 AM"
     type: str # "Video Call" or "In-person"
+    starts_at: Optional[datetime] = None # Sortable start time; the *_str fields are for display
+
+    __table_args__ = (Index("ix_appointment_user_starts", "user_id", "starts_at"),)
+
+class CareTeam(SQLModel, table=True):
+    # Which clinician looks after which patient; the PK order serves "patients of clinician X" scans
+    __table_args__ = (Index("ix_careteam_patient", "patient_id"),)
+
+    clinician_id: int = Field(foreign_key="user.id", primary_key=True)
+    patient_id: int = Field(foreign_key="user.id", primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Requested by the clinician; the patient must approve before any of their data is shared
+    approved_at: Optional[datetime] = None
 
 class UserStats(SQLModel, table=True):
+    # One row per user; also the conflict target of the stats UPSERT
+    __table_args__ = (Index("ux_userstats_user_id", "user_id", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     pain_level: int = 0
-    pain_history: str = "" 
+    pain_history: str = "" # Legacy; /stats now derives it from SessionResult
     program_completion: int = 0
     adherence_score: int = 0
     streak_days: int = 0
 
+class SessionResult(SQLModel, table=True):
+    # History queries are always "one user, a time range": serve them from one composite index
+    __table_args__ = (Index("ix_sessionresult_user_created", "user_id", "created_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    activity_name: str
+    score: Optional[float] = None
+    pain_detected: bool = False
+    fatigue_observed: bool = False
+    result_json: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SessionRollup(SQLModel, table=True):
+    # Per-user daily/weekly aggregates, maintained incrementally with every stats flush
+    __table_args__ = (Index("ux_sessionrollup_user_bucket_start", "user_id", "bucket", "bucket_start", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    bucket: str # "day" or "week" (weeks start on Monday)
+    bucket_start: date
+    sessions: int = 0
+    scored_sessions: int = 0
+    score_sum: float = 0
+    pain_events: int = 0
+    fatigue_events: int = 0
+
 # Pydantic Schemas for API
 class UserCreate(BaseModel):
+    # No role: every signup is a PATIENT (a client-chosen role would unlock cohort access)
     email: str
     password: str
     full_name: str
-    role: str = "PATIENT"
 
 class UserRead(BaseModel):
     id: int
@@ -87,6 +159,66 @@ class UserUpdate(BaseModel):
     dob: Optional[str] = None
     gender: Optional[str] = None
 
+class SessionResultRead(BaseModel):
+    id: int
+    activity_name: str
+    score: Optional[float] = None
+    pain_detected: bool
+    fatigue_observed: bool
+    created_at: datetime
+
+class StatsRead(BaseModel):
+    user_id: int
+    pain_level: int
+    pain_history: str # Comma-joined pain values of the last 10 sessions, oldest first
+    program_completion: int
+    adherence_score: int
+    streak_days: int
+    sessions: List[SessionResultRead] = []
+
+class TimeseriesPoint(BaseModel):
+    bucket_start: date
+    sessions: int
+    mean_score: Optional[float] = None
+    pain_event_rate: float
+    fatigue_rate: float
+
+class AppointmentRead(BaseModel):
+    id: int
+    title: str
+    doctor: str
+    date_str: str
+    time_str: str
+    type: str
+    starts_at: Optional[datetime] = None
+
+class StatsSummary(BaseModel):
+    pain_level: int
+    program_completion: int
+    adherence_score: int
+    streak_days: int
+
+class CohortPatient(BaseModel):
+    id: int
+    email: str
+    full_name: str
+    stats: Optional[StatsSummary] = None
+    next_appointment: Optional[AppointmentRead] = None
+
+class CohortPage(BaseModel):
+    patients: List[CohortPatient]
+    next_cursor: Optional[int] = None # Pass as `after` to fetch the next page
+
+class CareTeamAdd(BaseModel):
+    patient_email: str
+
+class CareTeamRequestRead(BaseModel):
+    clinician_id: int
+    clinician_name: str
+    clinician_email: str
+    requested_at: datetime
+    approved_at: Optional[datetime] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -101,13 +233,81 @@ class AnalysisRequest(BaseModel):
     mime_type: str = "video/webm"
 
 # --- SETUP ---
-connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-engine = create_engine(DATABASE_URL, connect_args=connect_args, pool_pre_ping=True, pool_recycle=300)
-# Create tables on startup
-SQLModel.metadata.create_all(engine)
+# Sync engine for threadpool routes and workers; async engine for `async def` routes.
+# Both are pooled from DB_POOL_* env vars, and SQLite connections run in WAL mode.
+engine = create_db_engine(DATABASE_URL)
+async_engine = create_async_db_engine(DATABASE_URL)
+async_session_factory = create_async_session_factory(async_engine)
 
-app = FastAPI(title="PhysioVibe API")
-print("--- SERVER RELOADED WITH UUID FIX ---")
+def upgrade_schema():
+    """create_all skips existing tables, so add columns and indexes introduced later explicitly."""
+    columns = {column["name"] for column in inspect(engine).get_columns("appointment")}
+    if "starts_at" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE appointment ADD COLUMN starts_at TIMESTAMP"))
+    if "approved_at" not in {column["name"] for column in inspect(engine).get_columns("careteam")}:
+        # Links made before consent existed stay pending until the patient approves them
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE careteam ADD COLUMN approved_at TIMESTAMP"))
+    if "ux_userstats_user_id" not in {index["name"] for index in inspect(engine).get_indexes("userstats")}:
+        dedupe_user_stats()
+    # Failing here fails startup: the stats UPSERT relies on the unique index
+    for model in (Appointment, UserStats, CareTeam):
+        for index in model.__table__.indexes:
+            index.create(engine, checkfirst=True)
+
+def dedupe_user_stats():
+    """
+    Older trees could create several UserStats rows per user. Keeps the lowest id per user
+    (the row the old `.first()` lookups read and updated) so the unique index can be built.
+    """
+    table = UserStats.__table__
+    keep = select(func.min(table.c.id)).group_by(table.c.user_id)
+    with engine.begin() as conn:
+        removed = conn.execute(delete(table).where(table.c.id.not_in(keep))).rowcount
+    if removed:
+        logger.warning("Removed %d duplicate UserStats rows before creating ux_userstats_user_id", removed)
+
+def init_db():
+    SQLModel.metadata.create_all(engine)
+    upgrade_schema()
+
+async def warmup():
+    """Opens a pooled async connection so the first request doesn't pay for it."""
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.warning("Database warmup failed: %s", e)
+    if PRELOAD_GENAI_SDK:
+        # Off the startup path: the server is accepting requests while the SDK imports
+        asyncio.create_task(asyncio.to_thread(preload_sdk))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables here rather than at import so `import backend.main` (tests, reload, tooling) stays cheap
+    await run_in_threadpool(init_db)
+    await warmup()
+    await stats_writer.start()
+    await job_runner.start()
+    if live_api_key():
+        # Connects in the background; startup doesn't wait on the handshakes
+        await live_pool.start()
+    yield
+    await live_pool.stop()
+    await job_runner.stop()
+    # Flush queued stats before the process exits
+    await stats_writer.stop()
+    password_hasher.shutdown()
+    await google_verifier.aclose()
+    # Release pooled upstream connections
+    await close_clients()
+    await async_engine.dispose()
+    # Drain queued log records last, so shutdown messages above aren't lost
+    shutdown_logging()
+
+app = FastAPI(title="PhysioVibe API", lifespan=lifespan)
+logger.info("PhysioVibe API loaded")
 
 # CORS
 app.add_middleware(
@@ -117,8 +317,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the histogram covers CORS and error handling too
+app.add_middleware(HTTPMetricsMiddleware)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher()
+google_verifier = GoogleTokenVerifier()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 # --- UTILITIES ---
@@ -126,11 +329,41 @@ def get_session():
     with Session(engine) as session:
         yield session
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def get_async_session():
+    async with async_session_factory() as session:
+        yield session
+
+hashing_busy_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many sign-ins in progress, retry shortly",
+    headers={"Retry-After": "2"},
+)
+
+async def verify_password(plain_password, hashed_password):
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except HashingBusy:
+        raise hashing_busy_exception
+
+async def get_password_hash(password):
+    try:
+        return await password_hasher.hash(password)
+    except HashingBusy:
+        raise hashing_busy_exception
+
+def get_google_verifier() -> GoogleTokenVerifier:
+    """Dependency so the upstream verifier can be swapped (e.g. for a local stub in load tests)."""
+    return google_verifier
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def find_user_by_email(session: Session, email: str) -> Optional[User]:
+    statement = select(User).where(User.email == email)
+    return session.exec(statement).first()
+
+def save_and_refresh(session: Session, obj):
+    session.add(obj)
+    session.commit()
+    session.refresh(obj)
+    return obj
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -142,56 +375,81 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+# email -> User column values; token digest -> email
+user_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+token_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+
+def decode_token_subject(token: str) -> Optional[str]:
+    """Returns the token's subject, skipping signature verification for tokens seen recently."""
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    email = token_cache.get(digest)
+    if email is not None:
+        return email
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    email = payload.get("sub")
+    if email is not None:
+        # Never outlive the token itself
+        token_cache.set(digest, email, ttl=payload["exp"] - time.time())
+    return email
+
+async def load_user(email: str) -> Optional[dict]:
+    async with async_session_factory() as session:
+        statement = select(User).where(User.email == email)
+        user = (await session.exec(statement)).first()
+        return user.model_dump() if user else None
+
+def invalidate_user_cache(email: str):
+    user_cache.pop(email)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
+        email = decode_token_subject(token)
         if email is None:
             raise credentials_exception
     except jwt.PyJWTError:
         raise credentials_exception
     
-    statement = select(User).where(User.email == email)
-    user = session.exec(statement).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    user_data = user_cache.get(email)
+    if user_data is None:
+        user_data = await load_user(email)
+        if user_data is None:
+            raise credentials_exception
+        user_cache.set(email, user_data)
+    # A fresh detached instance per request, so callers never share mutable state
+    return User(**user_data)
 
 # --- ENDPOINTS ---
 
 @app.post("/auth/signup", response_model=UserRead)
-def signup(user: UserCreate, session: Session = Depends(get_session)):
+async def signup(user: UserCreate, session: Session = Depends(get_session)):
     # Check existing
-    statement = select(User).where(User.email == user.email)
-    existing_user = session.exec(statement).first()
+    existing_user = await run_in_threadpool(find_user_by_email, session, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Create User
-    hashed_pw = get_password_hash(user.password)
+    # Create User (bcrypt runs on the hashing process pool)
+    hashed_pw = await get_password_hash(user.password)
     db_user = User(
         email=user.email, 
         hashed_password=hashed_pw, 
         full_name=user.full_name, 
-        role=user.role
+        role="PATIENT"
     )
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    db_user = await run_in_threadpool(save_and_refresh, session, db_user)
+    invalidate_user_cache(db_user.email)
     return db_user
 
 @app.post("/auth/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
     # Note: OAuth2PasswordRequestForm expects 'username', so we map email to it
-    statement = select(User).where(User.email == form_data.username)
-    user = session.exec(statement).first()
+    user = await run_in_threadpool(find_user_by_email, session, form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -206,21 +464,10 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = D
     return {"access_token": access_token, "token_type": "bearer", "role": user.role}
 
 @app.post("/auth/google", response_model=Token)
-def google_login(token_data: GoogleToken, session: Session = Depends(get_session)):
+async def google_login(token_data: GoogleToken, session: Session = Depends(get_session), verifier: GoogleTokenVerifier = Depends(get_google_verifier)):
     try:
-        # Verify Access Token via UserInfo Endpoint
-        response = http_requests.get(
-            "https://www.googleapis.com/oauth2/v2/userinfo",
-            headers={"Authorization": f"Bearer {token_data.token}"}
-        )
-        
-        if response.status_code != 200:
-            print(f"Google Error: {response.text}") # Log to console
-            raise ValueError(f"Google API Error: {response.text}")
-            
-        id_info = response.json()
-        
-        # ... rest of logic
+        # Verify Access Token via UserInfo Endpoint (cached per token for a short TTL)
+        id_info = await verifier.verify(token_data.token)
         
         # Extract info
         email = id_info['email']
@@ -228,12 +475,11 @@ def google_login(token_data: GoogleToken, session: Session = Depends(get_session
         google_id = id_info['id'] # Unique Google ID
         
         # Check if user exists
-        statement = select(User).where(User.email == email)
-        user = session.exec(statement).first()
+        user = await run_in_threadpool(find_user_by_email, session, email)
         
         if not user:
             # Auto-register
-            print("CRITICAL DEBUG: Creating new user from Google - BYPASSING HASH")
+            logger.info("Creating new user from Google sign-in (no password hash)")
             
             # NUCLEAR FIX: Do NOT use bcrypt for this user. 
             # Since they login via Google, they don't need a password hash.
@@ -246,9 +492,7 @@ def google_login(token_data: GoogleToken, session: Session = Depends(get_session
                 full_name=name,
                 role="GEN_PATIENT"
             )
-            session.add(user)
-            session.commit()
-            session.refresh(user)
+            user = await run_in_threadpool(save_and_refresh, session, user)
             
         # Create Access Token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -258,24 +502,29 @@ def google_login(token_data: GoogleToken, session: Session = Depends(get_session
         )
         return {"access_token": access_token, "token_type": "bearer", "role": user.role}
 
+    except GoogleUnavailable:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Google sign-in is unavailable, retry shortly")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/users/me", response_model=UserRead)
 def update_user(user_update: UserUpdate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    # current_user may come from the auth cache; load the row into this session to update it
+    db_user = session.get(User, current_user.id)
     if user_update.full_name is not None:
-        current_user.full_name = user_update.full_name
+        db_user.full_name = user_update.full_name
     if user_update.phone is not None:
-        current_user.phone = user_update.phone
+        db_user.phone = user_update.phone
     if user_update.dob is not None:
-        current_user.dob = user_update.dob
+        db_user.dob = user_update.dob
     if user_update.gender is not None:
-        current_user.gender = user_update.gender
+        db_user.gender = user_update.gender
     
-    session.add(current_user)
+    session.add(db_user)
     session.commit()
-    session.refresh(current_user)
-    return current_user
+    session.refresh(db_user)
+    invalidate_user_cache(db_user.email)
+    return db_user
 
 @app.get("/users/me", response_model=UserRead)
 async def read_users_me(current_user: User = Depends(get_current_user)):
@@ -283,87 +532,591 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
 
 # --- DASHBOARD DATA MODELS ---
 
-@app.post("/analyze")
-def analyze_session(request: AnalysisRequest, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    try:
-        # 1. Run Analysis
-        result = analyze_video(request.base64_video, request.activity_name, request.mime_type)
-        
-        # 2. Persist Stats
-        try:
-            statement = select(UserStats).where(UserStats.user_id == current_user.id)
-            stats = session.exec(statement).first()
-            
-            if not stats:
-                stats = UserStats(user_id=current_user.id)
-            
-            # Update Pain Logic
-            # If pain_detected is True, we assume a high pain level (e.g., 7-8), else low (1-3)
-            # In a real app, the AI could return a precise score.
-            is_pain = result.get('pain_detected', False)
-            new_pain_val = 7 if is_pain else 2
-            
-            stats.pain_level = new_pain_val
-            
-            # Update History (Keep last 10)
-            history = stats.pain_history.split(',') if stats.pain_history else []
-            history.append(str(new_pain_val))
-            if len(history) > 10:
-                history = history[-10:]
-            stats.pain_history = ",".join(history)
-            
-            # Update Progression
-            stats.streak_days += 1
-            stats.program_completion = min(stats.program_completion + 5, 100)
-            
-            # Save
-            session.add(stats)
-            session.commit()
-            print(f"✅ User Stats Updated: Pain={new_pain_val}, Streak={stats.streak_days}")
+PAIN_HISTORY_LENGTH = 10
+
+def pain_value(pain_detected: bool) -> int:
+    # If pain_detected is True, we assume a high pain level (e.g., 7-8), else low (1-3)
+    # In a real app, the AI could return a precise score.
+    return 7 if pain_detected else 2
+
+def dialect_insert():
+    """The dialect's INSERT construct if it supports ON CONFLICT DO UPDATE, else None."""
+    return {"sqlite": sqlite_insert, "postgresql": postgresql_insert}.get(engine.dialect.name)
+
+def upsert_stats(session: Session, user_id: int, sessions: int, pain_level: int):
+    """Atomically adds `sessions` completed sessions to a user's stats row, creating it if needed."""
+    table = UserStats.__table__
+    completion = table.c.program_completion + 5 * sessions
+    changes = {
+        "pain_level": pain_level,
+        "streak_days": table.c.streak_days + sessions,
+        "program_completion": case((completion > 100, 100), else_=completion),
+    }
+    insert = dialect_insert()
+    if insert is not None:
+        statement = insert(table).values(
+            user_id=user_id,
+            pain_level=pain_level,
+            pain_history="",
+            program_completion=min(5 * sessions, 100),
+            adherence_score=0,
+            streak_days=sessions,
+        ).on_conflict_do_update(index_elements=[table.c.user_id], set_=changes)
+        session.execute(statement)
+        return
+
+    # Other backends: increment in place, insert if the row doesn't exist yet
+    result = session.execute(update(table).where(table.c.user_id == user_id).values(**changes))
+    if result.rowcount == 0:
+        session.add(UserStats(user_id=user_id, pain_level=pain_level, program_completion=min(5 * sessions, 100), streak_days=sessions))
+
+ROLLUP_COUNTERS = ("sessions", "scored_sessions", "score_sum", "pain_events", "fatigue_events")
+
+def bucket_start(day: date, bucket: str) -> date:
+    return day - timedelta(days=day.weekday()) if bucket == "week" else day
+
+def upsert_rollup(session: Session, user_id: int, bucket: str, start: date, counts: dict):
+    """Atomically adds `counts` to one rollup row, creating it if needed."""
+    table = SessionRollup.__table__
+    changes = {name: table.c[name] + counts[name] for name in ROLLUP_COUNTERS}
+    insert = dialect_insert()
+    if insert is not None:
+        statement = insert(table).values(user_id=user_id, bucket=bucket, bucket_start=start, **counts).on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.bucket, table.c.bucket_start], set_=changes
+        )
+        session.execute(statement)
+        return
+
+    result = session.execute(
+        update(table)
+        .where(table.c.user_id == user_id, table.c.bucket == bucket, table.c.bucket_start == start)
+        .values(**changes)
+    )
+    if result.rowcount == 0:
+        session.add(SessionRollup(user_id=user_id, bucket=bucket, bucket_start=start, **counts))
+
+def write_stats_batch(batch: List[dict]):
+    """Writes a batch of analysis outcomes: SessionResult rows plus one stats UPSERT per user, in one transaction."""
+    per_user = {}
+    rollups = {}
+    with ANALYZE_STAGE_SECONDS.time("persist"), Session(engine) as session:
+        for item in batch:
+            result = item["result"]
+            is_pain = bool(result.get('pain_detected', False))
+            is_fatigue = bool(result.get('fatigue_observed', False))
+            score = result.get('score')
+            score = float(score) if isinstance(score, (int, float)) else None
+            session.add(SessionResult(
+                user_id=item["user_id"],
+                activity_name=item["activity_name"],
+                score=score,
+                pain_detected=is_pain,
+                fatigue_observed=is_fatigue,
+                result_json=json.dumps(result),
+                created_at=item["created_at"],
+            ))
+            # Coalesce: count sessions per user, keep the latest pain reading
+            sessions, _ = per_user.get(item["user_id"], (0, None))
+            per_user[item["user_id"]] = (sessions + 1, pain_value(is_pain))
             
-        except Exception as db_err:
-            print(f"⚠️ Failed to save stats: {db_err}")
-            # Don't fail the request if DB save fails, just log it.
+            # ...and sum rollup counters per (user, bucket, bucket start)
+            for bucket in ("day", "week"):
+                key = (item["user_id"], bucket, bucket_start(item["created_at"].date(), bucket))
+                counts = rollups.setdefault(key, dict.fromkeys(ROLLUP_COUNTERS, 0))
+                counts["sessions"] += 1
+                counts["scored_sessions"] += score is not None
+                counts["score_sum"] += score or 0
+                counts["pain_events"] += is_pain
+                counts["fatigue_events"] += is_fatigue
         
-        return result
+        for user_id, (sessions, pain_level) in per_user.items():
+            upsert_stats(session, user_id, sessions, pain_level)
+        for (user_id, bucket, start), counts in rollups.items():
+            upsert_rollup(session, user_id, bucket, start, counts)
+        session.commit()
+    logger.debug("Stats flushed: %d sessions for %d users", len(batch), len(per_user))
+
+stats_writer = WriteBehindBatcher(write_stats_batch)
+
+def record_analysis(user_id: int, activity_name: str, result: dict):
+    """Queues the analysis outcome for the write-behind stats batcher (no I/O on the request path)."""
+    stats_writer.submit({
+        "user_id": user_id,
+        "activity_name": activity_name,
+        "result": result,
+        "created_at": datetime.utcnow(),
+    })
+
+analysis_cache = AnalysisCache(engine)
+video_budget = SpoolBudget()
+
+async def run_file_analysis(video_file, size: int, activity_name: str, mime_type: str, on_field: Optional[FieldCallback] = None) -> dict:
+    """
+    analyze_video_file_async behind the content-addressed result cache.
+    `on_field` only sees fields when this call runs the upstream analysis (not on cache hits).
+    """
+    with ANALYZE_STAGE_SECONDS.time("cache_key"):
+        key = await asyncio.to_thread(build_file_cache_key, video_file, activity_name, mime_type)
+    return await analysis_cache.get_or_compute(key, lambda: analyze_video_file_async(video_file, size, activity_name, mime_type, on_field))
+
+def spool_http_error(e: Exception) -> HTTPException:
+    if isinstance(e, VideoTooLarge):
+        return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Video exceeds {VIDEO_MAX_BYTES} bytes")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy with other videos, retry later",
+        headers={"Retry-After": "5"},
+    )
+
+async def spool_base64_video(base64_video: str) -> VideoSpool:
+    """Decodes a base64 payload into a VideoSpool, charging it against the in-flight budget."""
+    spool = VideoSpool(video_budget)
+    try:
+        await spool.reserve(base64_decoded_size(base64_video))
+        # Decoding multi-MB payloads is CPU work; keep it off the event loop
+        with ANALYZE_STAGE_SECONDS.time("decode"):
+            await asyncio.to_thread(spool.write_base64, base64_video)
+        spool.finalize()
+        return spool
+    except (VideoTooLarge, SpoolBudgetExceeded) as e:
+        await spool.aclose()
+        raise spool_http_error(e)
+    except ValueError:
+        await spool.aclose()
+        raise HTTPException(status_code=400, detail="Invalid base64 video")
+
+class SpoolStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that owns a VideoSpool. The spool is released however the
+    response ends, including when the client is gone before the body starts and
+    the generator (and its own cleanup) never runs.
+    """
+
+    def __init__(self, content, spool: VideoSpool, **kwargs):
+        super().__init__(content, **kwargs)
+        self.spool = spool
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Run the generator's cleanup (stopping anything still reading the spool) first
+            await self.body_iterator.aclose()
+            await self.spool.aclose()
+
+async def spool_request_body(request: Request) -> VideoSpool:
+    """Streams a raw request body into a VideoSpool, charging it against the in-flight budget."""
+    spool = VideoSpool(video_budget)
+    try:
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            await spool.reserve(int(content_length))
+        async for chunk in request.stream():
+            await spool.reserve(spool.size + len(chunk))
+            spool.write(chunk)
+        if spool.size == 0:
+            raise HTTPException(status_code=400, detail="Empty video upload")
+        spool.finalize()
+        return spool
+    except (VideoTooLarge, SpoolBudgetExceeded) as e:
+        await spool.aclose()
+        raise spool_http_error(e)
+    except BaseException:
+        await spool.aclose()
+        raise
+
+async def analyze_spooled(spool: VideoSpool, activity_name: str, mime_type: str, user: User) -> dict:
+    try:
+        # 1. Run Analysis (awaits the upstream call without holding a threadpool worker)
+        result = await run_file_analysis(spool, spool.size, activity_name, mime_type)
     except Exception as e:
-        print(f"Analysis Error: {e}")
+        logger.error("Analysis failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+    # 2. Persist Stats (write-behind; a failed flush doesn't fail the request)
+    record_analysis(user.id, activity_name, result)
+
+    return result
+
+@app.post("/analyze")
+async def analyze_session(request: AnalysisRequest, current_user: User = Depends(get_current_user)):
+    spool = await spool_base64_video(request.base64_video)
+    try:
+        return await analyze_spooled(spool, request.activity_name, request.mime_type, current_user)
+    finally:
+        await spool.aclose()
+
+@app.post("/analyze/upload")
+async def analyze_upload(request: Request, activity_name: str, mime_type: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """
+    Binary variant of /analyze: the request body is the raw video (Content-Type is its MIME type).
+    The body is streamed into a VideoSpool instead of being parsed as base64-in-JSON.
+    """
+    mime_type = mime_type or request.headers.get("content-type", "").split(";")[0].strip() or "video/webm"
+    spool = await spool_request_body(request)
+    try:
+        return await analyze_spooled(spool, activity_name, mime_type, current_user)
+    finally:
+        await spool.aclose()
+
+@app.post("/analyze/stream")
+async def analyze_session_stream(request: AnalysisRequest, current_user: User = Depends(get_current_user)):
+    """
+    Server-Sent Events variant of /analyze. A `field` event ({"name", "value"}) is sent for each
+    result field (pain_detected, score, ...) as soon as the model has streamed it, then a
+    `result` event with the full object, or an `error` event ({"detail"}) if the analysis fails.
+    Cached results skip straight to `result`.
+    """
+    spool = await spool_base64_video(request.base64_video)
+    fields = asyncio.Queue()
+
+    async def event_stream():
+        analysis = asyncio.create_task(run_file_analysis(
+            spool, spool.size, request.activity_name, request.mime_type,
+            on_field=lambda name, value: fields.put_nowait((name, value)),
+        ))
+        analysis.add_done_callback(lambda _: fields.put_nowait(None))
+        try:
+            while True:
+                try:
+                    field = await asyncio.wait_for(fields.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # The model's thinking phase can be silent for a while
+                    yield ": keep-alive\n\n"
+                    continue
+                if field is None:
+                    break
+                name, value = field
+                yield f"event: field\ndata: {json.dumps({'name': name, 'value': value})}\n\n"
+
+            try:
+                result = analysis.result()
+            except Exception as e:
+                logger.error("Analysis failed: %s", e)
+                yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+                return
+            record_analysis(current_user.id, request.activity_name, result)
+            yield f"event: result\ndata: {json.dumps(result)}\n\n"
+        finally:
+            # Client went away mid-analysis; stop reading the spool before the response closes it
+            analysis.cancel()
+            await asyncio.gather(analysis, return_exceptions=True)
+
+    return SpoolStreamingResponse(event_stream(), spool, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# --- BACKGROUND ANALYSIS JOBS ---
+
+job_runner = AnalysisJobRunner(engine, analyze=run_file_analysis, on_success=record_analysis)
+
+def get_owned_job(job_id: str, user: User):
+    job = job_runner.get(job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/analyze/jobs", response_model=AnalysisJobRead, status_code=status.HTTP_202_ACCEPTED)
+async def submit_analysis_job(request: AnalysisRequest, current_user: User = Depends(get_current_user)):
+    spool = await spool_base64_video(request.base64_video)
+    try:
+        job = await job_runner.submit(current_user.id, spool, request.activity_name, request.mime_type)
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analysis queue is full, retry later",
+            headers={"Retry-After": "10"},
+        )
+    finally:
+        await spool.aclose()
+    return AnalysisJobRead.from_job(job)
+
+@app.get("/analyze/jobs/{job_id}", response_model=AnalysisJobRead)
+def get_analysis_job(job_id: str, current_user: User = Depends(get_current_user)):
+    return AnalysisJobRead.from_job(get_owned_job(job_id, current_user))
+
+@app.get("/analyze/jobs/{job_id}/events")
+async def stream_analysis_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Server-Sent Events stream of job status changes, ending with the terminal state."""
+    await run_in_threadpool(get_owned_job, job_id, current_user)
+
+    async def event_stream():
+        last_status = None
+        while True:
+            # Subscribe before reading so a change between the two isn't missed
+            changed = job_runner.subscribe(job_id)
+            job = await run_in_threadpool(job_runner.get, job_id)
+            if job.status != last_status:
+                last_status = job.status
+                yield f"event: status\ndata: {AnalysisJobRead.from_job(job).model_dump_json()}\n\n"
+            if job.status in TERMINAL_STATUSES:
+                job_runner.unsubscribe(job_id)
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/analyze/cache/stats")
+def get_analysis_cache_stats(current_user: User = Depends(get_current_user)):
+    return analysis_cache.stats()
+
 # moved to top
 
 # --- DASHBOARD ENDPOINTS ---
 
 @app.get("/appointments")
-def get_appointments(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+async def get_appointments(session: AsyncSession = Depends(get_async_session), current_user: User = Depends(get_current_user)):
     statement = select(Appointment).where(Appointment.user_id == current_user.id)
-    results = session.exec(statement).all()
+    results = (await session.exec(statement)).all()
     
     # Auto-seed removed for clean slate
     # if not results: ...
         
     return results
-        
-    return results
 
-@app.get("/stats")
-def get_stats(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+# --- CLINICIAN COHORT ---
+
+def require_clinician(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role != "CLINICIAN":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Clinician access required")
+    return current_user
+
+@app.post("/cohort/patients", status_code=status.HTTP_202_ACCEPTED)
+def add_cohort_patient(body: CareTeamAdd, session: Session = Depends(get_session), clinician: User = Depends(require_clinician)):
+    """
+    Asks a patient to join the clinician's cohort. Nothing is shared until the patient
+    approves it via /care-team/{clinician_id}/approve. The response is the same whether or not the
+    email is registered, so this can't be used to probe for accounts.
+    """
+    patient = find_user_by_email(session, body.patient_email)
+    if patient is not None and patient.id != clinician.id and session.get(CareTeam, (clinician.id, patient.id)) is None:
+        session.add(CareTeam(clinician_id=clinician.id, patient_id=patient.id))
+        session.commit()
+    return {"status": "requested"}
+
+def care_team_read(link: CareTeam, clinician: User) -> CareTeamRequestRead:
+    return CareTeamRequestRead(
+        clinician_id=clinician.id,
+        clinician_name=clinician.full_name,
+        clinician_email=clinician.email,
+        requested_at=link.created_at,
+        approved_at=link.approved_at,
+    )
+
+@app.get("/care-team", response_model=List[CareTeamRequestRead])
+def get_care_team(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """Clinicians who can see the current user's data (approved_at set) or are asking to (pending)."""
+    rows = session.exec(
+        select(CareTeam, User).join(User, User.id == CareTeam.clinician_id).where(CareTeam.patient_id == current_user.id)
+    ).all()
+    return [care_team_read(link, clinician) for link, clinician in rows]
+
+@app.post("/care-team/{clinician_id}/approve", response_model=CareTeamRequestRead)
+def approve_care_team(clinician_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    link = session.get(CareTeam, (clinician_id, current_user.id))
+    if link is None:
+        raise HTTPException(status_code=404, detail="No request from this clinician")
+    if link.approved_at is None:
+        link.approved_at = datetime.utcnow()
+        session.add(link)
+        session.commit()
+        session.refresh(link)
+    return care_team_read(link, session.get(User, clinician_id))
+
+@app.delete("/care-team/{clinician_id}", status_code=status.HTTP_204_NO_CONTENT)
+def remove_care_team(clinician_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """Declines a pending request or revokes an approved clinician's access."""
+    link = session.get(CareTeam, (clinician_id, current_user.id))
+    if link is not None:
+        session.delete(link)
+        session.commit()
+
+@app.get("/cohort", response_model=CohortPage)
+def get_cohort(
+    after: Optional[int] = Query(None, description="Keyset cursor: the next_cursor of the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    pain_within_days: Optional[int] = Query(None, ge=1, description="Only patients with pain detected in the last N days"),
+    session: Session = Depends(get_session),
+    clinician: User = Depends(require_clinician),
+):
+    """
+    A page of the clinician's patients (those who approved the link) with their stats and next appointment.
+    Always three queries regardless of page size: patients, stats, appointments.
+    """
+    # 1. Patients page, keyset-paginated on patient id (no OFFSET scans)
+    statement = (
+        select(User)
+        .join(CareTeam, CareTeam.patient_id == User.id)
+        .where(CareTeam.clinician_id == clinician.id, CareTeam.approved_at.is_not(None))
+    )
+    if after is not None:
+        statement = statement.where(CareTeam.patient_id > after)
+    if pain_within_days is not None:
+        since = datetime.utcnow() - timedelta(days=pain_within_days)
+        recent_pain = (
+            select(SessionResult.id)
+            .where(SessionResult.user_id == User.id, SessionResult.created_at >= since, SessionResult.pain_detected == True)
+            .exists()
+        )
+        statement = statement.where(recent_pain)
+    patients = session.exec(statement.order_by(CareTeam.patient_id).limit(limit + 1)).all()
+    has_more = len(patients) > limit
+    patients = patients[:limit]
+    patient_ids = [p.id for p in patients]
+    if not patient_ids:
+        return CohortPage(patients=[])
+
+    # 2. Latest stats for the whole page
+    stats_by_user = {
+        stats.user_id: stats
+        for stats in session.exec(select(UserStats).where(UserStats.user_id.in_(patient_ids))).all()
+    }
+
+    # 3. Each patient's next upcoming appointment (first row per user by start time)
+    ranked = (
+        select(
+            Appointment,
+            func.row_number().over(partition_by=Appointment.user_id, order_by=Appointment.starts_at).label("rank"),
+        )
+        .where(Appointment.user_id.in_(patient_ids), Appointment.starts_at >= datetime.utcnow())
+        .subquery()
+    )
+    upcoming = aliased(Appointment, ranked)
+    next_by_user = {
+        appointment.user_id: appointment
+        for appointment in session.exec(select(upcoming).where(ranked.c.rank == 1)).all()
+    }
+
+    return CohortPage(
+        patients=[
+            CohortPatient(
+                id=p.id,
+                email=p.email,
+                full_name=p.full_name,
+                stats=StatsSummary.model_validate(stats_by_user[p.id], from_attributes=True) if p.id in stats_by_user else None,
+                next_appointment=AppointmentRead.model_validate(next_by_user[p.id], from_attributes=True) if p.id in next_by_user else None,
+            )
+            for p in patients
+        ],
+        next_cursor=patient_ids[-1] if has_more else None,
+    )
+
+@app.get("/stats", response_model=StatsRead)
+async def get_stats(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user),
+):
     statement = select(UserStats).where(UserStats.user_id == current_user.id)
-    stats = session.exec(statement).first()
+    stats = (await session.exec(statement)).first()
     
     if not stats:
-        # Create default stats
+        # Default stats; the row itself is created by the first stats flush
         stats = UserStats(user_id=current_user.id)
-        session.add(stats)
-        session.commit()
-        session.refresh(stats)
-        
-    return stats
+    
+    # Newest first, as a range scan over (user_id, created_at)
+    history = select(SessionResult).where(SessionResult.user_id == current_user.id)
+    if from_ is not None:
+        history = history.where(SessionResult.created_at >= from_)
+    if to is not None:
+        history = history.where(SessionResult.created_at < to)
+    sessions = (await session.exec(history.order_by(SessionResult.created_at.desc()).limit(limit))).all()
+    
+    # pain_history (kept for the dashboard sparkline) is always the latest sessions
+    if from_ is None and to is None and limit >= PAIN_HISTORY_LENGTH:
+        recent = sessions[:PAIN_HISTORY_LENGTH]
+    else:
+        recent = (await session.exec(
+            select(SessionResult)
+            .where(SessionResult.user_id == current_user.id)
+            .order_by(SessionResult.created_at.desc())
+            .limit(PAIN_HISTORY_LENGTH)
+        )).all()
+    
+    pain_history = [str(pain_value(r.pain_detected)) for r in reversed(recent)]
+    if len(pain_history) < PAIN_HISTORY_LENGTH and stats.pain_history:
+        # Accounts from before SessionResult only have the legacy column; it's no longer
+        # written, so its values all predate the rows above
+        legacy = [v for v in stats.pain_history.split(",") if v]
+        pain_history = (legacy + pain_history)[-PAIN_HISTORY_LENGTH:]
+    
+    return StatsRead(
+        user_id=stats.user_id,
+        pain_level=stats.pain_level,
+        pain_history=",".join(pain_history),
+        program_completion=stats.program_completion,
+        adherence_score=stats.adherence_score,
+        streak_days=stats.streak_days,
+        sessions=[SessionResultRead.model_validate(r, from_attributes=True) for r in sessions],
+    )
+
+@app.get("/stats/timeseries", response_model=List[TimeseriesPoint])
+async def get_stats_timeseries(
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    bucket: Literal["day", "week"] = "day",
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Trend data for the Analytics view, read from rollups only (O(buckets), not O(sessions))."""
+    to = to or datetime.utcnow().date()
+    from_ = from_ or to - timedelta(days=30)
+    statement = (
+        select(SessionRollup)
+        .where(
+            SessionRollup.user_id == current_user.id,
+            SessionRollup.bucket == bucket,
+            SessionRollup.bucket_start >= bucket_start(from_, bucket),
+            SessionRollup.bucket_start <= to,
+        )
+        .order_by(SessionRollup.bucket_start)
+    )
+    return [
+        TimeseriesPoint(
+            bucket_start=r.bucket_start,
+            sessions=r.sessions,
+            mean_score=r.score_sum / r.scored_sessions if r.scored_sessions else None,
+            pain_event_rate=r.pain_events / r.sessions if r.sessions else 0,
+            fatigue_rate=r.fatigue_events / r.sessions if r.sessions else 0,
+        )
+        for r in (await session.exec(statement)).all()
+    ]
 
 @app.get("/")
 def root():
     return {"message": "PhysioVibe API is running"}
 
+@app.get("/health")
+def health():
+    return {
+        "status": "ok",
+        "stats_write_queue_depth": stats_writer.queue_depth,
+        "stats_flushed": stats_writer.flushed,
+        "stats_failed_flushes": stats_writer.failed_flushes,
+        "stats_set_aside": stats_writer.set_aside_total,
+        "analysis_job_queue_depth": job_runner.queue_depth,
+        "live_frames_forwarded": frame_totals["forwarded"],
+        "live_frames_dropped": frame_totals["dropped"],
+        "live_sessions": live_queue_totals()["sessions"],
+        "live_queue_depth": live_queue_totals()["queue_depth"],
+        "live_session_pool": live_pool.stats(),
+    }
+
+# Queue-style values are read at scrape time, so nothing is tracked per request for them
+Gauge("physiovibe_live_sessions", "Open live safety monitor sessions.", lambda: live_queue_totals()["sessions"])
+Gauge("physiovibe_live_queue_depth", "Media waiting to be sent upstream, across live sessions.", lambda: live_queue_totals()["queue_depth"])
+Gauge("physiovibe_live_pool_idle_sessions", "Pre-connected live sessions ready to be claimed.", lambda: live_pool.stats()["idle"])
+Gauge("physiovibe_stats_write_queue_depth", "Analysis outcomes waiting for the stats flush.", lambda: stats_writer.queue_depth)
+Gauge("physiovibe_analysis_job_queue_depth", "Queued background analysis jobs.", lambda: job_runner.queue_depth)
+Gauge("physiovibe_password_hash_pending", "bcrypt calls queued or running.", lambda: password_hasher.pending)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # --- WEBSOCKET ENDPOINT ---
 
 # --- CONFIG ---
@@ -372,62 +1125,85 @@ PROJECT_ID = "ai-agent-477309"
 LOCATION = "us-central1"
 MODEL_ID = "gemini-2.0-flash-exp" 
 
+# System Instruction from User's Working Code
+SYSTEM_INSTRUCTION = (
+    "You are a medical monitoring AI. Analyze the incoming video and audio stream. "
+    "If you detect facial grimacing, wincing, crying, or grunting indicative of pain, "
+    "output the text 'PAIN_DETECTED'. Otherwise, remain silent."
+)
+
+LIVE_CONFIG = {
+    "response_modalities": ["TEXT"],
+    "system_instruction": SYSTEM_INSTRUCTION,
+}
+
+def live_api_key() -> Optional[str]:
+    return os.environ.get("GEMINI_API_KEY") or os.environ.get("VITE_GEMINI_API_KEY")
+
+async def connect_live_session():
+    # User's Logic: v1alpha + Text Mode + API Key (client built off-loop: the first call imports the SDK)
+    client = await asyncio.to_thread(get_genai_client, live_api_key(), "v1alpha")
+    return client.aio.live.connect(model=MODEL_ID, config=LIVE_CONFIG)
+
+# Sessions are connected with the system instruction applied before a patient connects
+live_pool = LiveSessionPool(connect_live_session)
+
 @app.websocket("/ws/live-safety-monitor")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    print("--- STARTING SAFETY MONITOR SESSION (User Logic / Text-Based) ---")
+    # Clients offering the physiovibe.media.v1 subprotocol send binary frames; others send JSON + base64
+    binary = await accept_live_socket(websocket)
+    logger.info("Starting safety monitor session", extra={"binary": binary})
     
     # Auth
-    api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("VITE_GEMINI_API_KEY")
-    if not api_key:
-        print("❌ ERROR: Missing GEMINI_API_KEY")
+    if not live_api_key():
+        logger.error("Missing GEMINI_API_KEY, closing live socket")
         await websocket.close(code=1008)
         return
 
-    # User's Logic: v1alpha + Text Mode + API Key
-    client = genai.Client(
-        api_key=api_key, 
-        http_options={'api_version': 'v1alpha'}
-    )
-    
-    # System Instruction from User's Working Code
-    SYSTEM_INSTRUCTION = (
-        "You are a medical monitoring AI. Analyze the incoming video and audio stream. "
-        "If you detect facial grimacing, wincing, crying, or grunting indicative of pain, "
-        "output the text 'PAIN_DETECTED'. Otherwise, remain silent."
-    )
-    
-    config = {
-        "response_modalities": ["TEXT"],
-        "system_instruction": SYSTEM_INSTRUCTION,
-    }
+    # Skips frames that barely differ from the last one sent (patient holding a pose)
+    frame_gate = FrameGate()
+    # Drops silence and raises the loud-distress alert locally, before anything reaches Gemini
+    audio_gate = AudioGate()
+    # Socket reads never wait on Gemini: frames are queued here and sent by forward_to_gemini
+    media_queue = LiveMediaQueue()
 
     try:
-        async with client.aio.live.connect(model=MODEL_ID, config=config) as session:
-            print("✅ Connected to Gemini Live session")
+        # Claims a pre-connected session when one is idle, otherwise connects now
+        async with live_pool.session() as session:
+            logger.info("Connected to Gemini Live session")
 
             async def receive_from_client():
                 """Receives media from React frontend and forwards to Gemini."""
                 try:
                     while True:
-                        data = await websocket.receive_text()
-                        message = json.loads(data)
-
-                        # Handle different media types (User's JSON format)
-                        if "audio" in message:
-                            # Frontend sends base64 encoded PCM (16kHz)
-                            audio_data = base64.b64decode(message["audio"])
-                            await session.send(input={"mime_type": "audio/pcm", "data": audio_data}, end_of_turn=False)
-                        
-                        elif "image" in message:
-                            # Frontend sends base64 encoded JPEG
-                            image_data = base64.b64decode(message["image"])
-                            await session.send(input={"mime_type": "image/jpeg", "data": image_data}, end_of_turn=False)
+                        # 16kHz PCM audio or JPEG frames, either framing
+                        frame = await receive_media(websocket, binary)
+                        if frame is None:
+                            continue
+                        if frame.kind == MEDIA_VIDEO and not frame_gate.should_forward(frame.data):
+                            continue
+                        if frame.kind == MEDIA_AUDIO:
+                            forward, distress = audio_gate.process(frame.data)
+                            if distress:
+                                logger.warning("Loud distress detected (local audio)")
+                                await websocket.send_json({"status": "ALERT", "message": "Loud distress detected", "source": "audio"})
+                            if not forward:
+                                continue
+                        media_queue.put(frame)
                 
                 except WebSocketDisconnect:
-                    print("Client disconnected (receive loop)")
+                    logger.info("Client disconnected (receive loop)")
+                except Exception as e:
+                    logger.error("Error in receive_from_client: %s", e)
+                finally:
+                    media_queue.close()
+
+            async def forward_to_gemini():
+                """Drains the media queue into the Gemini session (audio first, freshest video)."""
+                try:
+                    await forward_media(media_queue, session)
                 except Exception as e:
-                    print(f"Error in receive_from_client: {e}")
+                    logger.error("Error in forward_to_gemini: %s", e)
 
             async def send_to_client():
                 """Receives text from Gemini and forwards alerts to React frontend."""
@@ -442,26 +1218,30 @@ async def websocket_endpoint(websocket: WebSocket):
                                 for part in model_turn.parts:
                                     if part.text:
                                         text = part.text
-                                        print(f"Gemini: {text}")
+                                        # Per-reply chatter is sampled; alerts below are always logged
+                                        live_events.debug("Gemini: %s", text)
                                         
                                         # Parse for the Magic Word "PAIN_DETECTED" or "PAIN"
                                         if "PAIN" in text:
-                                            print("!!! PAIN DETECTED (Text Trigger) !!!")
+                                            logger.warning("Pain detected (text trigger)")
                                             await websocket.send_json({"status": "ALERT", "message": "Pain Detected"})
                                         else:
                                             # Forward normal text for debug
                                             pass
                                             
                 except Exception as e:
-                    print(f"Error in send_to_client: {e}")
+                    logger.error("Error in send_to_client: %s", e)
 
-            # Run both tasks concurrently
-            await asyncio.gather(receive_from_client(), send_to_client())
+            # Run all tasks concurrently; when the client hangs up the upstream loops are cancelled
+            await run_session_loops(receive_from_client(), forward_to_gemini(), send_to_client())
 
-    except Exception as e:
-        print(f"❌ Connection closed error: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Live safety session closed with an error")
     finally:
+        media_queue.close()
+        if media_queue.first_forward_ms is not None:
+            live_pool.record_first_forward(media_queue.first_forward_ms)
+        logger.info("Live session finished", extra={"frames": frame_gate.stats(), "audio": audio_gate.stats(), "queue": media_queue.stats()})
         try:
              await websocket.close()
         except:
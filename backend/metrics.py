@@ -0,0 +1,173 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Tuple
+
+# Seconds; spans cached hits (~ms) to full upstream analyses (~minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Monotonic counter keyed by label values (positional, in `labels` order).
+    `inc` is a dict update with no lock: it is meant for the event loop thread,
+    where the live media hot path calls it per frame.
+    """
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple, float] = {}
+        _registry.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for values, total in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, values)} {total}"
+
+
+class Gauge:
+    """Read at scrape time from `collect`, which returns a number or {label values: number}."""
+
+    def __init__(self, name: str, help: str, collect: Callable, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.collect = collect
+        _registry.append(self)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    """Fixed-bucket histogram. `observe` takes a lock since stages also run in worker threads."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {} # label values -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = [(values, list(counts), total) for values, (counts, total) in self._series.items()]
+        for values, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, values)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}"
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- APP METRICS ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "physiovibe_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"),
+)
+ANALYZE_STAGE_SECONDS = Histogram(
+    "physiovibe_analyze_stage_duration_seconds", "Time spent in each /analyze stage.", ("stage",),
+)
+UPSTREAM_PAYLOAD_BYTES = Counter(
+    "physiovibe_upstream_payload_bytes_total", "Media bytes sent to Gemini.", ("path",),
+)
+UPSTREAM_ERRORS = Counter(
+    "physiovibe_upstream_errors_total", "Failed Gemini calls by path and exception type.", ("path", "type"),
+)
+LIVE_FORWARDED = Counter(
+    "physiovibe_live_forwarded_total", "Live media sent upstream (rate() gives frames / audio chunks per second).", ("kind",),
+)
+LIVE_DROPPED = Counter(
+    "physiovibe_live_dropped_total", "Live media not sent upstream, by reason.", ("kind", "reason"),
+)
+LIVE_FIRST_FORWARD_SECONDS = Histogram(
+    "physiovibe_live_first_forward_seconds", "Time from live WebSocket accept to the first frame sent upstream.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 30),
+)
+
+
+class HTTPMetricsMiddleware:
+    """
+    Pure ASGI middleware timing HTTP requests. Labels use the matched route
+    template (e.g. /analyze/jobs/{job_id}) so ids don't explode cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"], getattr(route, "path", "unmatched"), status_code,
+            )
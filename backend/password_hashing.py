@@ -0,0 +1,82 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# --- CONFIG ---
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Hash/verify calls allowed to be queued or running before new ones are refused
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+# bcrypt work factor for new hashes (existing hashes verify at the cost they were made with)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+_contexts = {}
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _context(rounds: int):
+    context = _contexts.get(rounds)
+    if context is None:
+        # Only the worker processes hash, so only they need passlib/bcrypt
+        from passlib.context import CryptContext
+        context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        _contexts[rounds] = context
+    return context
+
+# Module-level so they can be pickled into the worker processes
+def _hash_password(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    from passlib.exc import UnknownHashError
+
+    try:
+        return _context(BCRYPT_ROUNDS).verify(password, hashed_password)
+    except UnknownHashError:
+        # Not a bcrypt hash (e.g. the Google sign-in placeholder). Anything else,
+        # such as a broken bcrypt backend, must surface as a server error, not a 401.
+        return False
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated process pool so hashing never occupies the
+    request threadpool or the GIL. Calls beyond `max_pending` fail fast with HashingBusy.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING, rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs the event loop and threadpool is unsafe
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HashingBusy()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(_verify_password, password, hashed_password)
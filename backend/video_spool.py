@@ -0,0 +1,133 @@
+import os
+import io
+import mmap
+import base64
+import asyncio
+import tempfile
+
+# --- CONFIG ---
+VIDEO_MAX_BYTES = int(os.getenv("VIDEO_MAX_BYTES", str(200 * 1024 * 1024)))
+# Videos up to this size stay in memory; larger ones spill to a temp file read back via mmap
+VIDEO_SPOOL_MEMORY_BYTES = int(os.getenv("VIDEO_SPOOL_MEMORY_BYTES", str(4 * 1024 * 1024)))
+# Total video bytes all in-flight analyses may hold at once
+VIDEO_INFLIGHT_BUDGET_BYTES = int(os.getenv("VIDEO_INFLIGHT_BUDGET_BYTES", str(1024 * 1024 * 1024)))
+# How long a new upload waits for budget before being turned away
+VIDEO_BUDGET_WAIT_SECONDS = float(os.getenv("VIDEO_BUDGET_WAIT_SECONDS", "5"))
+# Base64 characters decoded per step (multiple of 4)
+_BASE64_CHUNK_CHARS = 4 * 1024 * 1024
+
+
+class VideoTooLarge(Exception):
+    pass
+
+class SpoolBudgetExceeded(Exception):
+    pass
+
+
+def base64_decoded_size(base64_video: str) -> int:
+    """Upper bound of the decoded size of a (possibly data-URL prefixed) base64 string."""
+    return (len(base64_video) - base64_video.rfind(",") - 1) * 3 // 4
+
+
+class SpoolBudget:
+    """Global budget of video bytes held by in-flight analyses. Waiters get backpressure, then a refusal."""
+
+    def __init__(self, limit: int = VIDEO_INFLIGHT_BUDGET_BYTES, wait_seconds: float = VIDEO_BUDGET_WAIT_SECONDS):
+        self.limit = limit
+        self.wait_seconds = wait_seconds
+        self.in_use = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, nbytes: int):
+        if nbytes > self.limit:
+            raise SpoolBudgetExceeded()
+        async with self._cond:
+            try:
+                await asyncio.wait_for(self._cond.wait_for(lambda: self.in_use + nbytes <= self.limit), self.wait_seconds)
+            except asyncio.TimeoutError:
+                raise SpoolBudgetExceeded()
+            self.in_use += nbytes
+
+    async def release(self, nbytes: int):
+        async with self._cond:
+            self.in_use -= nbytes
+            self._cond.notify_all()
+
+
+class VideoSpool:
+    """
+    Holds one video's raw bytes for the duration of an analysis.
+
+    Small videos stay in a BytesIO; once `memory_bytes` is exceeded the data
+    moves to an anonymous temp file that is mapped read-only after `finalize`.
+    Readers use the file-like `seek`/`read` interface either way.
+    """
+
+    def __init__(self, budget: SpoolBudget, max_bytes: int = VIDEO_MAX_BYTES, memory_bytes: int = VIDEO_SPOOL_MEMORY_BYTES):
+        self.budget = budget
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.size = 0
+        self._reserved = 0
+        self._buffer = io.BytesIO()
+        self._file = None
+        self._map = None
+        self._reader = None
+
+    async def reserve(self, total: int):
+        """Grows the budget reservation to `total` bytes, failing fast if it exceeds the size limit."""
+        if total > self.max_bytes:
+            raise VideoTooLarge()
+        if total > self._reserved:
+            await self.budget.acquire(total - self._reserved)
+            self._reserved = total
+
+    def write(self, chunk: bytes):
+        if self.size + len(chunk) > self.max_bytes:
+            raise VideoTooLarge()
+        if self._file is None and self.size + len(chunk) > self.memory_bytes:
+            self._file = tempfile.TemporaryFile()
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        (self._file or self._buffer).write(chunk)
+        self.size += len(chunk)
+
+    def write_base64(self, base64_video: str):
+        """Decodes a (possibly data-URL prefixed, whitespace-laden) base64 string slice by slice."""
+        carry = ""
+        for start in range(base64_video.rfind(",") + 1, len(base64_video), _BASE64_CHUNK_CHARS):
+            piece = carry + "".join(base64_video[start:start + _BASE64_CHUNK_CHARS].split())
+            usable = len(piece) - len(piece) % 4
+            self.write(base64.b64decode(piece[:usable]))
+            carry = piece[usable:]
+        if carry:
+            self.write(base64.b64decode(carry + "=" * (-len(carry) % 4)))
+
+    def finalize(self):
+        """Switches the spool to read mode."""
+        if self._file is not None:
+            self._file.flush()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._reader = self._map
+        else:
+            self._reader = self._buffer
+        self._reader.seek(0)
+
+    def seek(self, offset: int, whence: int = 0):
+        return self._reader.seek(offset, whence)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._reader.read() if size is None or size < 0 else self._reader.read(size)
+
+    async def aclose(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._buffer = None
+        self._reader = None
+        if self._reserved:
+            reserved, self._reserved = self._reserved, 0
+            await self.budget.release(reserved)
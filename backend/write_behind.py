@@ -0,0 +1,117 @@
+import os
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIG ---
+STATS_FLUSH_INTERVAL_SECONDS = float(os.getenv("STATS_FLUSH_INTERVAL_SECONDS", "1.0"))
+# A flush is triggered early once this many updates are waiting
+STATS_FLUSH_BATCH_SIZE = int(os.getenv("STATS_FLUSH_BATCH_SIZE", "500"))
+# Updates kept across failed flushes before the oldest are dropped
+STATS_MAX_PENDING = int(os.getenv("STATS_MAX_PENDING", "100000"))
+
+
+class WriteBehindBatcher:
+    """
+    Collects updates from request handlers and hands them to `flush_fn` in
+    batches, on a timer or when a batch fills up. `flush_fn` runs in a thread
+    and should write the whole batch in one transaction.
+
+    When a batch fails, its items are retried one at a time so a single bad
+    update can't block the rest. Items that still fail on their own are set
+    aside (`set_aside`, bounded by `max_pending`). If every item fails, the
+    cause is more likely the database itself, so the batch is retried later.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List], None],
+        interval: float = STATS_FLUSH_INTERVAL_SECONDS,
+        batch_size: int = STATS_FLUSH_BATCH_SIZE,
+        max_pending: int = STATS_MAX_PENDING,
+    ):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending = []
+        self.set_aside = []
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.set_aside_total = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def submit(self, item):
+        """Queues an update. Must be called from the event loop; never blocks."""
+        self._pending.append(item)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Don't lose what is still queued
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            while self._pending:
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                try:
+                    await asyncio.to_thread(self.flush_fn, batch)
+                    self.flushed += len(batch)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    logger.warning("Failed to flush %d stats updates, retrying one by one: %s", len(batch), e)
+                    if not await self._flush_each(batch):
+                        # Retry on the next tick, keeping the queue bounded
+                        self._pending[:0] = batch
+                        self._trim(self._pending)
+                        return
+
+    async def _flush_each(self, batch: List) -> bool:
+        """Flushes items individually, setting aside the ones that fail. False if none went through."""
+        failed = []
+        for item in batch:
+            try:
+                await asyncio.to_thread(self.flush_fn, [item])
+                self.flushed += 1
+            except Exception as e:
+                failed.append((item, e))
+        if len(failed) == len(batch):
+            return False
+        for item, e in failed:
+            logger.error("Setting aside stats update that fails on its own: %s", e)
+            self.set_aside.append(item)
+        self.set_aside_total += len(failed)
+        self._trim(self.set_aside)
+        return True
+
+    def _trim(self, items: List):
+        overflow = len(items) - self.max_pending
+        if overflow > 0:
+            del items[:overflow]
+            self.dropped += overflow
@@ -1,7 +1,13 @@
 
 import React, { useState, useEffect } from 'react';
+import { PhysioAnalysisResult } from '../services/geminiService';
 
-const ProcessingView: React.FC = () => {
+interface ProcessingViewProps {
+  // Result fields that have already streamed in from the analysis
+  partial?: Partial<PhysioAnalysisResult>;
+}
+
+const ProcessingView: React.FC<ProcessingViewProps> = ({ partial = {} }) => {
   // PASTE STITCH UI HERE
   const [progress, setProgress] = useState(0);
 
@@ -79,6 +85,23 @@ const ProcessingView: React.FC = () => {
           <p className="text-white/40 text-sm font-mono leading-normal text-center">Estimated wait: ~12 seconds</p>
         </div>
 
+        {/* Early Findings (streamed before the full report is ready) */}
+        {(partial.pain_detected !== undefined || partial.score !== undefined) && (
+          <div className="mt-4 flex w-full max-w-md flex-wrap items-center justify-center gap-3">
+            {partial.pain_detected !== undefined && (
+              <div className={`flex items-center gap-2 px-4 py-2 rounded-lg ${partial.pain_detected ? 'bg-red-500/20 text-red-400' : 'bg-primary/20 text-primary'}`}>
+                <span className="material-symbols-outlined text-lg">{partial.pain_detected ? 'warning' : 'check_circle'}</span>
+                <span className="text-sm font-bold">{partial.pain_detected ? 'Pain signals detected' : 'No pain detected'}</span>
+              </div>
+            )}
+            {partial.score !== undefined && (
+              <div className={`flex items-center gap-2 px-4 py-2 rounded-lg ${partial.score > 80 ? 'bg-primary/20 text-primary' : 'bg-yellow-500/20 text-yellow-400'}`}>
+                <span className="text-sm font-bold">Vibe Score: {partial.score}/100</span>
+              </div>
+            )}
+          </div>
+        )}
+
         {/* Live Status Logs */}
         <div className="mt-8 w-full max-w-md rounded-lg border border-[#326744]/30 bg-black/20 p-4 font-mono text-sm">
           <div className="flex flex-col gap-3">
@@ -1,9 +1,11 @@
 
 import { useState, useCallback } from 'react';
-import { analyzeSession, PhysioAnalysisResult } from '../services/geminiService';
+import { analyzeSessionStream, PhysioAnalysisResult } from '../services/geminiService';
 
 export const useGeminiBrain = () => {
     const [result, setResult] = useState<PhysioAnalysisResult | null>(null);
+    // Fields streamed in before the full result (shown on the processing screen)
+    const [partial, setPartial] = useState<Partial<PhysioAnalysisResult>>({});
     const [isAnalyzing, setIsAnalyzing] = useState(false);
     const [error, setError] = useState<string | null>(null);
 
@@ -11,9 +13,12 @@ export const useGeminiBrain = () => {
         setIsAnalyzing(true);
         setError(null);
         setResult(null);
+        setPartial({});
 
         try {
-            const data = await analyzeSession(base64Video, activityName, mimeType);
+            const data = await analyzeSessionStream(base64Video, activityName, mimeType, (name, value) => {
+                setPartial(prev => ({ ...prev, [name]: value } as Partial<PhysioAnalysisResult>));
+            });
             setResult(data);
         } catch (err: any) {
             console.error("Gemini Brain Malfunction:", err);
@@ -25,6 +30,7 @@ export const useGeminiBrain = () => {
 
     const resetBrain = useCallback(() => {
         setResult(null);
+        setPartial({});
         setError(null);
         setIsAnalyzing(false);
     }, []);
@@ -32,6 +38,7 @@ export const useGeminiBrain = () => {
     return {
         analyze,
         result,
+        partial,
         isAnalyzing,
         error,
         resetBrain
@@ -1,7 +1,7 @@
 
 import axios from 'axios';
 
-const API_URL = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8003';
+export const API_URL = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8003';
 
 // Create axios instance with base URL
 export const api = axios.create({
@@ -31,8 +31,7 @@ export const authService = {
             const response = await api.post('/auth/signup', {
                 email,
                 password,
-                full_name,
-                role: 'PATIENT' // Default role
+                full_name // Role is always PATIENT server-side
             });
             return response.data;
         } catch (error: any) {
@@ -1,4 +1,4 @@
-import { api } from './auth';
+import { api, API_URL } from './auth';
 
 // Define the shape of the data we expect from Gemini
 export interface PhysioAnalysisResult {
@@ -66,3 +66,61 @@ export const analyzeSession = async (base64Video: string, activityName: string,
     throw error;
   }
 };
+
+// Called with each result field as soon as the backend has it (e.g. pain_detected before the summary)
+export type AnalysisFieldHandler = (name: keyof PhysioAnalysisResult, value: unknown) => void;
+
+export const analyzeSessionStream = async (
+  base64Video: string,
+  activityName: string,
+  mimeType: string = "video/webm",
+  onField?: AnalysisFieldHandler
+): Promise<PhysioAnalysisResult> => {
+  // axios buffers the whole body in the browser, so the SSE stream is read with fetch
+  const token = localStorage.getItem('token');
+  const response = await fetch(`${API_URL}/analyze/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify({ base64_video: base64Video, activity_name: activityName, mime_type: mimeType }),
+  });
+  if (!response.ok || !response.body) {
+    const body = await response.json().catch(() => null);
+    throw new Error(body?.detail || `Analysis failed (${response.status})`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line; keep the trailing partial one for the next read
+    const events = buffer.split("\n\n");
+    buffer = events.pop() ?? "";
+    for (const event of events) {
+      let type = "message";
+      let data = "";
+      for (const line of event.split("\n")) {
+        if (line.startsWith("event: ")) type = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (!data) continue; // keep-alive comment
+
+      const payload = JSON.parse(data);
+      if (type === "field") {
+        onField?.(payload.name, payload.value);
+      } else if (type === "result") {
+        reader.cancel();
+        return payload as PhysioAnalysisResult;
+      } else if (type === "error") {
+        throw new Error(payload.detail || "Analysis failed");
+      }
+    }
+  }
+  throw new Error("Analysis stream ended without a result");
+};
@@ -0,0 +1,85 @@
+import asyncio
+
+from backend.analysis_cache import AnalysisCache
+
+
+def make_cache() -> AnalysisCache:
+    cache = AnalysisCache(engine=None)
+    # Memory tier only: the database tier is out of scope here
+    cache._persistent_get = lambda key: None
+    cache._persistent_put = lambda key, value: None
+    return cache
+
+
+def test_waiter_gets_result_when_first_caller_is_cancelled():
+    async def scenario():
+        cache = make_cache()
+        started = asyncio.Event()
+        calls = []
+
+        async def slow_compute():
+            calls.append("first")
+            started.set()
+            await asyncio.sleep(10)
+            return {"score": 1}
+
+        async def own_compute():
+            calls.append("waiter")
+            return {"score": 2}
+
+        first = asyncio.create_task(cache.get_or_compute("video", slow_compute))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_compute("video", own_compute))
+        await asyncio.sleep(0)
+
+        first.cancel() # e.g. the client of /analyze/stream disconnected
+        result = await asyncio.wait_for(waiter, timeout=1)
+
+        assert first.cancelled()
+        assert result == {"score": 2}
+        assert calls == ["first", "waiter"]
+        assert await cache.get_or_compute("video", slow_compute) == {"score": 2}
+
+    asyncio.run(scenario())
+
+
+def test_waiters_share_one_compute():
+    async def scenario():
+        cache = make_cache()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"score": 3}
+
+        results = await asyncio.gather(*(cache.get_or_compute("video", compute) for _ in range(5)))
+
+        assert results == [{"score": 3}] * 5
+        assert calls == 1
+        assert cache.coalesced == 4
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_the_analysis():
+    async def scenario():
+        cache = make_cache()
+        started = asyncio.Event()
+
+        async def compute():
+            started.set()
+            await asyncio.sleep(0.05)
+            return {"score": 4}
+
+        first = asyncio.create_task(cache.get_or_compute("video", compute))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_compute("video", compute))
+        await asyncio.sleep(0)
+        waiter.cancel()
+
+        assert await first == {"score": 4}
+        assert waiter.cancelled()
+
+    asyncio.run(scenario())